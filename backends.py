@@ -0,0 +1,278 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import cv2
+import numpy as np
+
+# --- INFERENCE BACKENDS ---
+# Every backend takes a list of BGR frames and returns one Detections per
+# frame, so VisionSystem does not care which runtime produced the boxes.
+#   "ultralytics" - PyTorch through Ultralytics (the original path)
+#   "onnxruntime" - ONNX export run by ONNX Runtime (CPU), optional INT8
+#                   (static QDQ quantisation calibrated on recorded frames)
+#   "openvino"    - OpenVINO IR export run on the OpenVINO CPU plugin, optional INT8
+# Exports are made once and cached, keyed by model hash, input size and precision.
+# They are exported with dynamic input shapes: predict(imgsz=(h, w)) runs a
+# smaller input (multiples of STRIDE), e.g. for ROI crops.
+
+BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+STRIDE = 32  # YOLOv8 input sides must be multiples of the largest feature stride
+CALIBRATION_FRAMES = 64  # frames fed through the FP32 model to calibrate INT8 activation ranges
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SPIDERBOT_MODEL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "spiderbot", "models"))
+
+class Detections:
+    """Boxes for one frame: xyxy (N, 4) float32 pixels, conf (N,) float32, cls (N,) int."""
+    __slots__ = ("xyxy", "conf", "cls")
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.cls)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.intp))
+
+class UltralyticsBackend:
+    def __init__(self, model_path, imgsz=640, threads=None, conf=0.5):
+        from ultralytics import YOLO
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.imgsz = imgsz
+        self.conf = conf
+
+    def predict(self, frames, classes=None, imgsz=None):
+        imgsz = self.imgsz if imgsz is None else list(imgsz)
+        results = self.model(frames, verbose=False, conf=self.conf, imgsz=imgsz, classes=classes)
+        return [Detections(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy(),
+                           r.boxes.cls.cpu().numpy().astype(np.intp)) for r in results]
+
+class _ExportedBackend:
+    """Shared YOLOv8 pre/post-processing for the exported (raw output) runtimes."""
+    iou = 0.45
+
+    def __init__(self, meta, conf):
+        self.names = {int(k): v for k, v in meta["names"].items()}
+        self.imgsz = meta["imgsz"]
+        self.conf = conf
+
+    def _letterbox(self, frame, out):
+        """Resize keeping aspect ratio and pad into `out` (input h x w x 3); returns scale and padding."""
+        h, w = frame.shape[:2]
+        sh, sw = out.shape[:2]
+        r = min(sh / h, sw / w)
+        nh, nw = int(round(h * r)), int(round(w * r))
+        top, left = (sh - nh) // 2, (sw - nw) // 2
+        out[:] = 114
+        out[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        return r, left, top
+
+    def _preprocess(self, frames, imgsz=None):
+        sh, sw = (self.imgsz, self.imgsz) if imgsz is None else imgsz
+        canvas = np.empty((sh, sw, 3), np.uint8)
+        blob = np.empty((len(frames), 3, sh, sw), np.float32)
+        transforms = []
+        for i, frame in enumerate(frames):
+            transforms.append(self._letterbox(frame, canvas))
+            # BGR -> RGB, HWC -> CHW and scale to 0..1 in one strided write
+            np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=blob[i], casting='unsafe')
+        return blob, transforms
+
+    def _postprocess(self, output, transforms, shapes, classes):
+        # YOLOv8 head: (batch, 4 + num_classes, anchors) with cx, cy, w, h first
+        dets = []
+        for pred, (r, left, top), (h, w) in zip(output, transforms, shapes):
+            pred = pred.T
+            scores = pred[:, 4:]
+            if classes is not None:
+                mask = np.zeros(scores.shape[1], bool)
+                mask[list(classes)] = True
+                scores = np.where(mask, scores, 0.0)
+            cls = scores.argmax(1)
+            conf = scores[np.arange(len(cls)), cls]
+            keep = conf >= self.conf
+            if not keep.any():
+                dets.append(Detections.empty())
+                continue
+            boxes, conf, cls = pred[keep, :4], conf[keep], cls[keep]
+
+            xyxy = np.empty_like(boxes)
+            xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+            xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+            # Class-aware NMS: offset each class so boxes of different classes never overlap
+            offset = (cls[:, None] * 4096).astype(np.float32)
+            shifted = xyxy + offset
+            wh = np.concatenate([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]], axis=1)
+            idx = cv2.dnn.NMSBoxes(wh.tolist(), conf.tolist(), self.conf, self.iou)
+            idx = np.asarray(idx, dtype=np.intp).reshape(-1)
+
+            # Undo letterbox
+            xyxy = xyxy[idx]
+            xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - left) / r).clip(0, w)
+            xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - top) / r).clip(0, h)
+            dets.append(Detections(xyxy.astype(np.float32), conf[idx].astype(np.float32), cls[idx].astype(np.intp)))
+        return dets
+
+    def predict(self, frames, classes=None, imgsz=None):
+        """imgsz=(h, w) overrides the export's square input size for this call."""
+        blob, transforms = self._preprocess(frames, imgsz)
+        output = self._run(blob)
+        return self._postprocess(output, transforms, [f.shape[:2] for f in frames], classes)
+
+class OnnxRuntimeBackend(_ExportedBackend):
+    def __init__(self, artifact, meta, threads=None, conf=0.5):
+        import onnxruntime as ort
+
+        super().__init__(meta, conf)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(artifact, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoBackend(_ExportedBackend):
+    def __init__(self, artifact, meta, threads=None, conf=0.5):
+        import openvino as ov
+
+        super().__init__(meta, conf)
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        xml = next(os.path.join(artifact, f) for f in os.listdir(artifact) if f.endswith(".xml"))
+        self.compiled = core.compile_model(core.read_model(xml), "CPU", config)
+        self._lock = threading.Lock()
+
+    def _run(self, blob):
+        with self._lock:
+            return self.compiled(blob)[0]
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+def calibration_frames(path, count=CALIBRATION_FRAMES):
+    """
+    Up to `count` BGR frames spread evenly over `path`: one source of a
+    recording (<recording>/<source name>, see modules.recording) or a
+    folder of images.
+    """
+    if os.path.isfile(os.path.join(path, "meta.json")):
+        from .recording import FrameRecording
+
+        recording = FrameRecording(os.path.dirname(os.path.abspath(path)), os.path.basename(os.path.normpath(path)))
+        picks = np.linspace(0, len(recording) - 1, min(count, len(recording))).astype(int) if len(recording) else []
+        return [np.array(recording.frame(i)) for i in picks]
+    files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                   if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")))
+    picks = np.linspace(0, len(files) - 1, min(count, len(files))).astype(int) if files else []
+    return [frame for frame in (cv2.imread(files[i]) for i in picks) if frame is not None]
+
+def _quantize_onnx(fp32, artifact, imgsz, int8_data):
+    """
+    Static INT8 quantisation in QDQ format. Dynamic quantisation turns the
+    convolutions into ConvInteger, which the CPU provider runs slower than
+    FP32; static QDQ keeps them on the fast int8 kernels. Activation ranges
+    come from frames preprocessed exactly as at inference time.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    import onnx
+
+    frames = calibration_frames(int8_data)
+    if not frames:
+        raise ValueError(f"no calibration frames found in {int8_data!r}")
+    preprocess = _ExportedBackend({"names": {}, "imgsz": imgsz}, conf=0.0)._preprocess
+    input_name = onnx.load(fp32, load_external_data=False).graph.input[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: preprocess([frame])[0]}
+
+    quantize_static(fp32, artifact, FrameReader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+def export_model(model_path, backend, imgsz=640, int8=False, cache_dir=DEFAULT_CACHE_DIR, int8_data=None):
+    """
+    Export a YOLO checkpoint for `backend` once and return (artifact path, metadata).
+    Later calls with the same weights, input size and precision reuse the cache.
+    INT8 ONNX exports are calibrated on int8_data (see calibration_frames());
+    the calibration set is not part of the cache key.
+    """
+    model = None
+    if not os.path.isfile(model_path):
+        # Let Ultralytics fetch the official weights first
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        model_path = getattr(model, "ckpt_path", None) or model_path
+
+    key = f"{os.path.splitext(os.path.basename(model_path))[0]}-{_file_hash(model_path)}-{imgsz}-{'int8' if int8 else 'fp32'}"
+    target = os.path.join(cache_dir, backend, key)
+    artifact = target + (".onnx" if backend == "onnxruntime" else "_openvino_model")
+    meta_path = target + ".json"
+
+    # A cache hit never imports Ultralytics / PyTorch
+    if not (os.path.exists(artifact) and os.path.exists(meta_path)):
+        int8_data = int8_data or os.environ.get("SPIDERBOT_INT8_DATA")
+        if backend == "onnxruntime" and int8 and not int8_data:
+            raise ValueError("INT8 ONNX needs calibration frames: pass int8_data (a recorded source "
+                             "directory or an image folder) or set SPIDERBOT_INT8_DATA")
+        if model is None:
+            from ultralytics import YOLO
+            model = YOLO(model_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if backend == "onnxruntime":
+            exported = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+            if int8:
+                # Quantise from a copy inside the cache; the FP32 export next to the weights is not kept
+                fp32 = target + "-fp32.onnx"
+                shutil.move(exported, fp32)
+                try:
+                    _quantize_onnx(fp32, artifact, imgsz, int8_data)
+                finally:
+                    os.remove(fp32)
+            else:
+                shutil.move(exported, artifact)
+        else:
+            exported = model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8)
+            if os.path.exists(artifact):
+                shutil.rmtree(artifact)
+            shutil.move(exported, artifact)
+        with open(meta_path, "w") as f:
+            json.dump({"names": model.names, "imgsz": imgsz, "int8": int8, "source": os.path.abspath(model_path)}, f)
+
+    with open(meta_path) as f:
+        return artifact, json.load(f)
+
+def load_backend(model_path="yolov8m.pt", backend="ultralytics", imgsz=640, threads=None, int8=False,
+                 conf=0.5, cache_dir=DEFAULT_CACHE_DIR, int8_data=None):
+    if backend == "ultralytics":
+        if int8:
+            raise ValueError("INT8 needs the onnxruntime or openvino backend")
+        return UltralyticsBackend(model_path, imgsz, threads, conf)
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+
+    artifact, meta = export_model(model_path, backend, imgsz, int8, cache_dir, int8_data)
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(artifact, meta, threads, conf)
+    return OpenVinoBackend(artifact, meta, threads, conf)
@@ -0,0 +1,280 @@
+"""
+Headless end-to-end benchmark of the perception pipeline.
+
+    python -m modules.bench --models yolov8n.pt yolov8m.pt --resolutions 320x240 640x480
+    python -m modules.bench --recording runs/lab --frames 500 --out bench.json
+    python -m modules.bench --recording runs/lab --focus target --roi --baseline bench.json
+    python -m modules.bench --baseline bench_v2.0.json
+    python -m modules.bench --backends onnxruntime openvino --precisions fp32 int8 --recording runs/lab
+
+Every (model, resolution) pair runs in a fresh process so peak RSS and
+model warm-up do not leak between runs. Results are written as JSON.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import cv2
+from .backends import BACKENDS
+
+WARMUP_FRAMES = 10
+
+class ResizedSource:
+    """
+    Wraps a frame source and resizes its frames to the benchmark resolution.
+    Follows the read(image) capture contract: the inner source decodes into
+    a reused buffer and the resized frame is written into `image`.
+    """
+    def __init__(self, source, width, height):
+        self.source = source
+        self.size = (width, height)
+        self._raw = None
+
+    def read(self, image=None):
+        ret, frame = self.source.read(self._raw)
+        if not ret:
+            return ret, frame
+        if frame.flags.writeable:
+            self._raw = frame
+        if image is None or image.shape[1::-1] != self.size or image.shape[2:] != frame.shape[2:]:
+            image = None
+        return True, cv2.resize(frame, self.size, dst=image)
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def release(self):
+        self.source.release()
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def _make_source(config):
+    from .sources import ReplaySource, SyntheticSource
+
+    # Sources never run dry: the run ends after a number of published frames
+    width, height = config["resolution"]
+    if config["recording"]:
+        source = ReplaySource(config["recording"], config["source_name"], realtime=config["realtime"], loop=True)
+        return ResizedSource(source, width, height)
+    fps = 30 if config["realtime"] else None
+    return SyntheticSource(width, height, fps=fps)
+
+def run_config(config):
+    """Run one benchmark configuration in this process and return its results."""
+    from .vision import VisionSystem
+
+    t_load = time.perf_counter()
+    vision = VisionSystem(config["model"], rgb_sources={"rgb": _make_source(config)}, thermal_indexes=(),
+                          backend=config["backend"], imgsz=config["imgsz"], threads=config["threads"],
+                          int8=config["int8"], int8_data=config.get("int8_data"),
+                          adaptive=config.get("adaptive", False), target_fps=config.get("target_fps"),
+                          focus=config.get("focus"), roi=config.get("roi", False))
+    load_s = time.perf_counter() - t_load
+
+    channel = vision.frame_channel
+    vision.stats.window = 1_000_000
+    vision.start()
+
+    # Warm-up: the first inferences include lazy initialisation
+    deadline = time.perf_counter() + config["timeout"]
+    while channel.seq < WARMUP_FRAMES and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    vision.stats.clear()
+    dropped0 = vision.get_stage_latency()["dropped"]["rgb"]
+    seq0 = channel.seq
+    t0 = time.perf_counter()
+
+    # Frames the pipeline cannot keep up with are dropped, as on the robot;
+    # the run ends once enough frames have reached the output channel.
+    while channel.seq - seq0 < config["frames"] and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - t0
+    published = channel.seq - seq0
+    vision.stop()
+    vision.join()
+
+    summary = vision.get_stage_latency()
+    dropped = summary.pop("dropped")["rgb"]
+    scheduling = {key: summary.pop(key)["rgb"]
+                  for key in ("detector_interval", "frames_detected", "frames_tracked") if key in summary}
+    roi = {key: summary.pop(key)["rgb"] for key in ("roi", "frames_cropped") if key in summary}
+    captured = summary.get("capture:rgb", {}).get("count", 0)
+    return {
+        "model": config["model"],
+        "backend": config["backend"],
+        "imgsz": config["imgsz"],
+        "int8": config["int8"],
+        "threads": config["threads"],
+        "resolution": "%dx%d" % tuple(config["resolution"]),
+        "source": config["recording"] or "synthetic",
+        "realtime": config["realtime"],
+        "adaptive": config.get("adaptive", False),
+        "focus": config.get("focus"),
+        "roi": config.get("roi", False),
+        "model_load_s": load_s,
+        "frames_captured": captured,
+        "frames_published": published,
+        "frames_dropped": {k: dropped[k] - dropped0[k] for k in dropped},
+        "fps": published / elapsed if elapsed > 0 else 0.0,
+        "stages": summary,
+        "scheduling": scheduling,
+        "roi_inference": roi,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def _worker(config, out):
+    try:
+        out.put(run_config(config))
+    except Exception as e:
+        out.put({"model": config["model"], "backend": config["backend"],
+                 "resolution": "%dx%d" % tuple(config["resolution"]), "error": repr(e)})
+
+def run_isolated(config):
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_worker, args=(config, out))
+    proc.start()
+    try:
+        result = out.get(timeout=config["timeout"] + 120)
+    except Exception:
+        result = {"model": config["model"], "error": "benchmark process timed out"}
+    proc.join(5)
+    if proc.is_alive():
+        proc.terminate()
+    return result
+
+def environment():
+    env = {"python": platform.python_version(), "platform": platform.platform(),
+           "cpu_count": os.cpu_count(), "opencv": cv2.__version__}
+    for module in ("numpy", "torch", "ultralytics"):
+        try:
+            env[module] = getattr(__import__(module), "__version__", "unknown")
+        except ImportError:
+            pass
+    return env
+
+def compare(results, baseline):
+    """
+    Print FPS and median stage latency against a previous results file.
+    Runs match by model, backend and resolution only, so a --focus / --roi
+    run compared with a plain baseline shows what focused inference gains.
+    """
+    def key(run):
+        return run["model"], run.get("backend", "ultralytics"), run["resolution"], run.get("int8", False)
+
+    old = {key(r): r for r in baseline["runs"] if "error" not in r}
+    for run in results["runs"]:
+        if "error" in run or key(run) not in old:
+            continue
+        prev = old[key(run)]
+        print(f"{run['model']} [{_label(run)}] @ {run['resolution']}: fps {prev['fps']:.1f} -> {run['fps']:.1f}")
+        for stage, stats in sorted(run["stages"].items()):
+            if stage in prev["stages"]:
+                before, after = prev["stages"][stage]["p50_ms"], stats["p50_ms"]
+                print(f"    {stage:<24} p50 {before:8.2f} -> {after:8.2f} ms")
+
+def _label(run):
+    return run.get("backend", "ultralytics") + (" int8" if run.get("int8") else "")
+
+def int8_speedups(runs):
+    """INT8 against FP32 runs of the same model, backend and resolution: FPS and median inference time."""
+    fp32 = {(r["model"], r["backend"], r["resolution"]): r for r in runs if "error" not in r and not r["int8"]}
+    rows = []
+    for run in runs:
+        if "error" in run or not run["int8"]:
+            continue
+        base = fp32.get((run["model"], run["backend"], run["resolution"]))
+        if base is None or not base["fps"]:
+            continue
+        rows.append({
+            "model": run["model"], "backend": run["backend"], "resolution": run["resolution"],
+            "fps_fp32": base["fps"], "fps_int8": run["fps"],
+            "inference_p50_ms_fp32": base["stages"].get("inference", {}).get("p50_ms"),
+            "inference_p50_ms_int8": run["stages"].get("inference", {}).get("p50_ms"),
+            "speedup": run["fps"] / base["fps"],
+        })
+    return rows
+
+def parse_resolution(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the VisionSystem pipeline headlessly.")
+    parser.add_argument("--models", nargs="+", default=["yolov8m.pt"])
+    parser.add_argument("--backends", nargs="+", default=["ultralytics"], choices=BACKENDS)
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=[(640, 480)])
+    parser.add_argument("--imgsz", type=int, default=640, help="model input size")
+    parser.add_argument("--threads", type=int, help="inference threads")
+    parser.add_argument("--precisions", nargs="+", default=["fp32"], choices=("fp32", "int8"),
+                        help="int8 runs the onnxruntime/openvino backends quantised")
+    parser.add_argument("--int8-data", help="INT8 ONNX calibration frames (default: the replayed recording source)")
+    parser.add_argument("--frames", type=int, default=300, help="measured frames per run (after warm-up)")
+    parser.add_argument("--recording", help="replay this modules.recording directory instead of synthetic frames")
+    parser.add_argument("--source-name", default="rgb", help="source inside the recording")
+    parser.add_argument("--realtime", action="store_true", help="pace frames at their recorded rate (30 fps when synthetic)")
+    parser.add_argument("--adaptive", action="store_true", help="adaptive detector scheduling with tracking")
+    parser.add_argument("--target-fps", type=float, help="FPS the adaptive scheduler aims for")
+    parser.add_argument("--focus", choices=("known", "target"), help="class-filtered inference (VisionSystem.set_focus)")
+    parser.add_argument("--roi", action="store_true", help="crop inference around the target (use a recording)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds per run")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    int8_data = args.int8_data or (os.path.join(args.recording, args.source_name) if args.recording else None)
+    results = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "runs": []}
+    for model in args.models:
+        for backend in args.backends:
+            for precision in args.precisions:
+                if precision == "int8" and backend == "ultralytics":
+                    continue
+                for resolution in args.resolutions:
+                    config = {"model": model, "backend": backend, "imgsz": args.imgsz, "threads": args.threads,
+                              "int8": precision == "int8", "int8_data": int8_data, "resolution": resolution,
+                              "frames": args.frames, "recording": args.recording, "source_name": args.source_name,
+                              "realtime": args.realtime, "adaptive": args.adaptive,
+                              "target_fps": args.target_fps, "focus": args.focus, "roi": args.roi,
+                              "timeout": args.timeout}
+                    print(f"Benchmarking {model} [{backend} {precision}] @ {resolution[0]}x{resolution[1]} ...",
+                          flush=True)
+                    run = run_isolated(config)
+                    results["runs"].append(run)
+                    if "error" in run:
+                        print(f"    failed: {run['error']}")
+                    else:
+                        print(f"    {run['fps']:.1f} fps, {run['frames_published']} frames, "
+                              f"peak RSS {run['peak_rss_mb']} MB")
+                        if "frames_cropped" in run["roi_inference"]:
+                            print(f"    {run['roi_inference']['frames_cropped']} frames inferred on an ROI crop")
+
+    results["int8_vs_fp32"] = int8_speedups(results["runs"])
+    for row in results["int8_vs_fp32"]:
+        print(f"{row['model']} [{row['backend']}] @ {row['resolution']}: INT8 {row['fps_int8']:.1f} fps vs "
+              f"FP32 {row['fps_fp32']:.1f} fps (x{row['speedup']:.2f})")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Camera and distance calibration from recordings (see modules.recording).
+
+    # 1. Intrinsics: record a checkerboard waved in front of the camera
+    python -m modules.calibration intrinsics runs/checker --pattern 9x6 --square 25 --out calibration.npz
+    # 2. Class widths: record the robot facing objects, with the ultrasonic sensor logging
+    python -m modules.calibration widths runs/lab --profile calibration.npz --out calibration.npz
+
+The profile (.npz) holds the intrinsics, precomputed undistortion remap
+tables and per-class distance coefficients (distance = scale / width_px
++ offset). VisionSystem(calibration=...) loads it at startup.
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from .backends import load_backend
+from .utils import DEFAULT_FOCAL_LENGTH, calculate_bearings, get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CALIBRATION_PATH = os.environ.get("SPIDERBOT_CALIBRATION", "calibration.npz")
+ULTRASONIC_HALF_ANGLE = np.radians(7.5)  # detections outside the sensor cone are not paired
+MAX_PAIR_DT = 0.1                        # seconds between a frame and its ultrasonic reading
+MIN_CLASS_SAMPLES = 10
+
+class CalibrationProfile:
+    """
+    Intrinsics, undistortion maps and per-class distance coefficients.
+    Any part may be missing: without intrinsics frames are not undistorted,
+    without fitted coefficients KNOWN_WIDTHS and the focal length are used.
+    """
+    def __init__(self, camera_matrix=None, dist_coeffs=None, image_size=None, class_names=(),
+                 class_scale=(), class_offset=(), rms=None, alpha=0.0):
+        self.camera_matrix = camera_matrix
+        self.dist_coeffs = dist_coeffs
+        self.image_size = tuple(image_size) if image_size is not None else None  # (width, height)
+        self.class_names = list(class_names)
+        self.class_scale = np.asarray(class_scale, np.float64)    # cm * px
+        self.class_offset = np.asarray(class_offset, np.float64)  # cm
+        self.rms = rms
+        self.alpha = alpha
+        self.new_camera_matrix = None
+        self._maps = {}  # (input size, output size) -> (map1, map2)
+        if camera_matrix is not None:
+            self.new_camera_matrix, _ = cv2.getOptimalNewCameraMatrix(
+                camera_matrix, dist_coeffs, self.image_size, alpha, self.image_size)
+
+    @property
+    def focal_length(self):
+        """Horizontal focal length (px) of the undistorted image at image_size."""
+        if self.new_camera_matrix is None:
+            return DEFAULT_FOCAL_LENGTH
+        return float(self.new_camera_matrix[0, 0])
+
+    # --- UNDISTORTION ---
+    def _scaled(self, matrix, size):
+        sx, sy = size[0] / self.image_size[0], size[1] / self.image_size[1]
+        return np.diag([sx, sy, 1.0]) @ matrix
+
+    def undistort_maps(self, size, out_size=None):
+        """
+        Cached cv2.remap tables (fixed-point CV_16SC2) from frames of
+        (width, height) to undistorted frames of out_size (default: same size).
+        """
+        out_size = size if out_size is None else out_size
+        maps = self._maps.get((size, out_size))
+        if maps is None:
+            maps = self._maps[size, out_size] = cv2.initUndistortRectifyMap(
+                self._scaled(self.camera_matrix, size), self.dist_coeffs, None,
+                self._scaled(self.new_camera_matrix, out_size), out_size, cv2.CV_16SC2)
+        return maps
+
+    def undistort(self, frame, dst=None):
+        if self.camera_matrix is None:
+            return frame
+        size = (frame.shape[1], frame.shape[0])
+        map1, map2 = self.undistort_maps(size)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR, dst=dst)
+
+    # --- DISTANCE MODEL ---
+    def class_tables(self, class_names):
+        """
+        (scale_table, offset_table) indexed by model class id: a fitted
+        class is at scale / width_px + offset cm, with scale in cm * px for
+        frames image_size wide. Unfitted classes have a NaN scale and keep
+        the KNOWN_WIDTHS model.
+        """
+        fitted = dict(zip(self.class_names, zip(self.class_scale.tolist(), self.class_offset.tolist())))
+        scale_table = np.full(max(class_names) + 1, np.nan)
+        offset_table = np.zeros(max(class_names) + 1)
+        for cls, name in class_names.items():
+            if name in fitted:
+                scale_table[cls], offset_table[cls] = fitted[name]
+        return scale_table, offset_table
+
+    # --- PERSISTENCE ---
+    def save(self, path):
+        arrays = {"class_names": np.array(self.class_names, dtype=str), "class_scale": self.class_scale,
+                  "class_offset": self.class_offset, "alpha": self.alpha, "created": time.time()}
+        if self.image_size is not None:
+            arrays["image_size"] = np.array(self.image_size)
+        if self.camera_matrix is not None:
+            map1, map2 = self.undistort_maps(self.image_size)
+            arrays.update(camera_matrix=self.camera_matrix, dist_coeffs=self.dist_coeffs,
+                          rms=np.nan if self.rms is None else self.rms, map1=map1, map2=map2)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            intrinsics = "camera_matrix" in data
+            profile = cls(data["camera_matrix"] if intrinsics else None,
+                          data["dist_coeffs"] if intrinsics else None,
+                          data["image_size"].tolist() if "image_size" in data else None,
+                          data["class_names"].tolist(), data["class_scale"], data["class_offset"],
+                          float(data["rms"]) if intrinsics else None, float(data["alpha"]))
+            if intrinsics:
+                # Precomputed tables: no map generation at startup
+                profile._maps[profile.image_size, profile.image_size] = (data["map1"], data["map2"])
+        return profile
+
+def load_profile(calibration):
+    """None, a CalibrationProfile or a path -> CalibrationProfile or None."""
+    if calibration is None or isinstance(calibration, CalibrationProfile):
+        return calibration
+    return CalibrationProfile.load(calibration)
+
+# --- CALIBRATION ---
+def _recorded_frames(directory, name, stride):
+    from .recording import FrameRecording
+
+    recording = FrameRecording(directory, name)
+    for i in range(0, len(recording), stride):
+        yield recording.times[i], recording.frame(i)
+
+def calibrate_intrinsics(directory, name="rgb", pattern=(9, 6), square_mm=25.0, stride=5, alpha=0.0):
+    """Checkerboard intrinsics from a recorded source; returns a CalibrationProfile."""
+    board = np.zeros((pattern[0] * pattern[1], 3), np.float32)
+    board[:, :2] = np.mgrid[0:pattern[0], 0:pattern[1]].T.reshape(-1, 2) * square_mm
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+    object_points, image_points, size = [], [], None
+    for _, frame in _recorded_frames(directory, name, stride):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        size = gray.shape[::-1]
+        found, corners = cv2.findChessboardCorners(gray, pattern, None)
+        if found:
+            object_points.append(board)
+            image_points.append(cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria))
+    if len(image_points) < 3:
+        raise ValueError(f"checkerboard {pattern[0]}x{pattern[1]} found in only {len(image_points)} frames")
+
+    rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(object_points, image_points, size, None, None)
+    log.info("intrinsics from %d views, reprojection RMS %.3f px", len(image_points), rms)
+    return CalibrationProfile(camera_matrix, dist_coeffs, size, rms=rms, alpha=alpha)
+
+def ultrasonic_samples(directory):
+    """(times, distances) decoded from a serial recording with the live parser."""
+    from .comms import CommunicationManager
+    from .recording import SerialRecording
+
+    recording = SerialRecording(directory)
+    comms = CommunicationManager(history_size=max(4096, 64 * len(recording)))
+    for i in range(len(recording)):
+        t, chunk = recording.chunk(i)
+        comms.feed(chunk, t)
+    return comms.get_samples()
+
+def fit_class_widths(profile, directory, name="rgb", model_path="yolov8m.pt", backend="ultralytics",
+                     stride=2, min_samples=MIN_CLASS_SAMPLES):
+    """
+    Regress distance = scale / width_px + offset per class against the
+    ultrasonic readings of the same recording. Only frames with exactly one
+    detection inside the sensor cone and a reading within MAX_PAIR_DT are
+    used. Returns a new profile with the fitted classes.
+    """
+    times, ranges = ultrasonic_samples(directory)
+    if len(times) == 0:
+        raise ValueError("no ultrasonic readings in the recording")
+    model = load_backend(model_path, backend)
+
+    pairs = {}
+    image_size = profile.image_size
+    for t, frame in _recorded_frames(directory, name, stride):
+        i = np.clip(np.searchsorted(times, t), 1, len(times) - 1)
+        i = i if abs(times[i] - t) < abs(times[i - 1] - t) else i - 1
+        if abs(times[i] - t) > MAX_PAIR_DT or ranges[i] <= 0:
+            continue
+        frame = profile.undistort(np.ascontiguousarray(frame))
+        # Scales are in px at image_size; VisionSystem rescales by its actual frame width
+        image_size = image_size or (frame.shape[1], frame.shape[0])
+        if frame.shape[1] != image_size[0]:
+            raise ValueError(f"recording is {frame.shape[1]} px wide, the profile is for {image_size[0]} px")
+        det = model.predict([frame])[0]
+        if len(det) == 0:
+            continue
+        bearings = calculate_bearings(det.xyxy, frame.shape[1], profile.focal_length, mirrored=False)
+        in_cone = np.flatnonzero(np.abs(bearings) < ULTRASONIC_HALF_ANGLE)
+        if len(in_cone) != 1:
+            continue
+        k = in_cone[0]
+        width = float(det.xyxy[k, 2] - det.xyxy[k, 0])
+        if width > 1:
+            pairs.setdefault(model.names[int(det.cls[k])], []).append((width, ranges[i]))
+
+    names, scales, offsets = [], [], []
+    for label, samples in sorted(pairs.items()):
+        if len(samples) < min_samples:
+            log.info("%s: %d samples, need %d - skipped", label, len(samples), min_samples)
+            continue
+        widths, distances = np.array(samples).T
+        design = np.column_stack([1.0 / widths, np.ones_like(widths)])
+        (scale, offset), *_ = np.linalg.lstsq(design, distances, rcond=None)
+        residual = distances - design @ (scale, offset)
+        log.info("%s: %d samples, scale %.0f, offset %.1f cm, RMS error %.1f cm",
+                 label, len(samples), scale, offset, np.sqrt(np.mean(residual ** 2)))
+        names.append(label)
+        scales.append(scale)
+        offsets.append(offset)
+
+    return CalibrationProfile(profile.camera_matrix, profile.dist_coeffs, image_size,
+                              names, scales, offsets, profile.rms, profile.alpha)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate camera intrinsics and per-class distances.")
+    sub = parser.add_subparsers(dest="step", required=True)
+
+    intr = sub.add_parser("intrinsics", help="checkerboard intrinsics and undistortion maps")
+    intr.add_argument("recording")
+    intr.add_argument("--source-name", default="rgb")
+    intr.add_argument("--pattern", default="9x6", help="inner corners, columns x rows")
+    intr.add_argument("--square", type=float, default=25.0, help="square size in mm")
+    intr.add_argument("--stride", type=int, default=5, help="use every n-th frame")
+    intr.add_argument("--alpha", type=float, default=0.0, help="0 crops to valid pixels, 1 keeps all")
+    intr.add_argument("--out", default=DEFAULT_CALIBRATION_PATH)
+
+    widths = sub.add_parser("widths", help="per-class distance fit against ultrasonic readings")
+    widths.add_argument("recording")
+    widths.add_argument("--source-name", default="rgb")
+    widths.add_argument("--profile", help="profile with intrinsics to start from")
+    widths.add_argument("--model", default="yolov8m.pt")
+    widths.add_argument("--backend", default="ultralytics")
+    widths.add_argument("--stride", type=int, default=2)
+    widths.add_argument("--min-samples", type=int, default=MIN_CLASS_SAMPLES)
+    widths.add_argument("--out", default=DEFAULT_CALIBRATION_PATH)
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    if args.step == "intrinsics":
+        cols, rows = (int(n) for n in args.pattern.lower().split("x"))
+        profile = calibrate_intrinsics(args.recording, args.source_name, (cols, rows), args.square,
+                                       args.stride, args.alpha)
+    else:
+        base = load_profile(args.profile) if args.profile else CalibrationProfile()
+        profile = fit_class_widths(base, args.recording, args.source_name, args.model, args.backend,
+                                   args.stride, args.min_samples)
+    profile.save(args.out)
+    print(f"Calibration profile written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -2,31 +2,126 @@ import serial
 import serial.tools.list_ports
 import threading
 import time
+import collections
+import numpy as np
+from .utils import SampleBuffer, get_logger
+from .pipeline import StageStats
+from .protocol import (BinaryDecoder, looks_binary, decode_telemetry, decode_ranges, decode_u16,
+                       encode_command, MSG_TELEMETRY, MSG_RANGES, MSG_BATTERY, MSG_ACK, RANGE_CHANNELS)
+
+log = get_logger(__name__)
+
+# Serial reader tuning
+READ_TIMEOUT = 0.1      # seconds a read may block waiting for the first byte
+MAX_LINE_LENGTH = 256   # discard unterminated garbage beyond this
+DETECT_BYTES = 512      # unclassifiable traffic after which ASCII is assumed
+WRITE_TIMEOUT = 0.2     # a stuck port must not hang the writer (or a stop command)
+
+# Outbound commands
+MOTION_COMMANDS = frozenset("FBLR")
+STOP_COMMAND = "S"
+MAX_PENDING_COMMANDS = 32
+ACK_TIMEOUT = 2.0       # seconds an unacknowledged command is remembered
+
+# Telemetry channels. "range0" is the front ultrasonic sensor, the only
+# channel old ASCII firmware reports.
+RANGE_NAMES = [f"range{i}" for i in range(RANGE_CHANNELS)]
+IMU_NAMES = ["accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z"]
+CHANNELS = RANGE_NAMES + IMU_NAMES + ["battery_v"]
+
+def parse_distance_line(line):
+    """
+    Parse one ASCII reading, e.g. b"Dist: 45" or b"45".
+    Returns the distance as a float, or None if the line is not a reading.
+    """
+    line = line.strip()
+    if b"Dist" in line:
+        parts = line.split(b':')
+        if len(parts) > 1:
+            return float(parts[1].strip())
+    elif line.replace(b'.', b'', 1).isdigit():
+        return float(line)
+    return None
+
+def detect_protocol(data):
+    """
+    "binary" once data holds a CRC-valid frame, "ascii" once it holds a
+    complete reading or ACK line, None while undecided (silence after an
+    Arduino reset, or a partial frame). Past DETECT_BYTES of traffic that
+    is neither, ASCII is assumed.
+    """
+    if looks_binary(data):
+        return "binary"
+    for line in bytes(data).split(b'\n')[:-1]:
+        if line.startswith(b"ACK"):
+            return "ascii"
+        try:
+            if parse_distance_line(line) is not None:
+                return "ascii"
+        except ValueError:
+            pass
+    return "ascii" if len(data) >= DETECT_BYTES else None
 
 class CommunicationManager:
-    def __init__(self):
+    def __init__(self, history_size=4096):
         self.serial_port = None
         self.is_connected = False
         self.ultrasonic_distance = 0.0
+        self.channels = {name: SampleBuffer(history_size) for name in CHANNELS}
+        self.samples = self.channels["range0"]
+        self.protocol = None  # "ascii" or "binary" once known
+        self.recorder = None  # optional modules.recording.Recorder; logs raw reads
+        self.parse_errors = 0
+        self.bytes_read = 0
         self.lock = threading.Lock()
+        self._line_buf = bytearray()
+        self._decoder = BinaryDecoder()
+        self._detect_buf = bytearray()  # feed(): traffic held back until the protocol is known
+        self.baudrate = 9600            # used to spread the lines of one read over their transmission time
+        self._last_stamp = 0.0
+
+        # Outbound: queue serviced by a writer thread
+        self.tag_commands = False  # ASCII only: append ":<seq>" so firmware can ACK
+        self._outbox = collections.deque()
+        self._outbox_cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stop_generation = 0  # bumped by every stop; queued motion from before it is never written
+        self._seq = 0
+        self._unacked = {}  # seq -> send time
+        self.coalesced = 0
+        self.dropped_commands = 0
+        self.ack_stats = StageStats()
 
     def get_available_ports(self):
         return [port.device for port in serial.tools.list_ports.comports()]
 
-    def connect(self, port, baudrate=9600):
+    def connect(self, port, baudrate=9600, protocol="auto"):
+        """
+        port: a device name, or any pyserial URL (e.g. "loop://", or the
+        pty of a modules.recording.SerialReplayer).
+        protocol: "ascii", "binary", or "auto" to detect it from the first traffic.
+        """
         if self.is_connected:
             self.disconnect()
         
         try:
-            self.serial_port = serial.Serial(port, baudrate, timeout=1)
+            self.serial_port = serial.serial_for_url(port, baudrate, timeout=READ_TIMEOUT, write_timeout=WRITE_TIMEOUT)
+            self.baudrate = baudrate
             self.is_connected = True
+            self.protocol = None if protocol == "auto" else protocol
+            with self._outbox_cond:
+                self._outbox.clear()
+            self._unacked.clear()
             threading.Thread(target=self._read_serial, daemon=True).start()
+            threading.Thread(target=self._write_serial, args=(self.serial_port,), daemon=True).start()
             return True, f"Connected to {port}"
         except Exception as e:
             return False, str(e)
 
     def disconnect(self):
         self.is_connected = False
+        with self._outbox_cond:
+            self._outbox_cond.notify_all()
         if self.serial_port:
             try:
                 self.serial_port.close()
@@ -35,33 +130,265 @@ class CommunicationManager:
             self.serial_port = None
 
     def send_command(self, cmd):
-        if self.is_connected and self.serial_port:
+        """
+        Queue a command for the writer thread and return immediately.
+        A motion command replaces a motion command still waiting in the
+        queue; a stop skips the queue, discards pending commands and is
+        written right away.
+        """
+        if not (self.is_connected and self.serial_port):
+            return False
+
+        if cmd == STOP_COMMAND:
+            with self._outbox_cond:
+                self._outbox.clear()
+                self._stop_generation += 1
+            return self._write(self.serial_port, self._next_seq(), cmd)
+
+        with self._outbox_cond:
+            if cmd in MOTION_COMMANDS and self._outbox and self._outbox[-1][1] in MOTION_COMMANDS:
+                self._outbox[-1] = (self._next_seq(), cmd)
+                self.coalesced += 1
+            else:
+                if len(self._outbox) >= MAX_PENDING_COMMANDS:
+                    self._outbox.popleft()
+                    self.dropped_commands += 1
+                self._outbox.append((self._next_seq(), cmd))
+            self._outbox_cond.notify()
+        return True
+
+    def _next_seq(self):
+        with self.lock:
+            self._seq = (self._seq + 1) & 0xFFFF
+            return self._seq
+
+    def _encode_command(self, seq, cmd):
+        if self.protocol == "binary":
+            return encode_command(seq, cmd)
+        if self.tag_commands:
+            return f"{cmd}:{seq}\n".encode()
+        return cmd.encode()
+
+    def _write(self, port, seq, cmd, generation=None):
+        """generation: stop generation the command was dequeued in; it is dropped if a stop came since."""
+        data = self._encode_command(seq, cmd)
+        try:
+            with self._write_lock:
+                if generation is not None and generation != self._stop_generation:
+                    log.debug("dropped %s queued before a stop", cmd, extra={"cmd": cmd, "seq": seq})
+                    return False
+                port.write(data)
+        except Exception as e:
+            log.warning("send failed: %s", e, extra={"cmd": cmd, "seq": seq})
+            return False
+
+        now = time.perf_counter()
+        with self.lock:
+            self._unacked[seq] = now
+            if len(self._unacked) > MAX_PENDING_COMMANDS:
+                for old in [s for s, t in self._unacked.items() if now - t > ACK_TIMEOUT]:
+                    del self._unacked[old]
+        log.debug("sent %s", cmd, extra={"cmd": cmd, "seq": seq})
+        return True
+
+    def _write_serial(self, port):
+        while self.is_connected and port is self.serial_port:
+            with self._outbox_cond:
+                if not self._outbox:
+                    self._outbox_cond.wait(0.5)
+                    continue
+                seq, cmd = self._outbox.popleft()
+                generation = self._stop_generation
+            self._write(port, seq, cmd, generation)
+
+    def _acknowledge(self, seqs):
+        now = time.perf_counter()
+        with self.lock:
+            for seq in seqs:
+                try:
+                    seq = int(seq)
+                except ValueError:
+                    self.parse_errors += 1
+                    continue
+                sent = self._unacked.pop(seq, None)
+                if sent is not None:
+                    self.ack_stats.record("ack_rtt", now - sent)
+
+    def get_command_latency(self):
+        """Round-trip command -> ACK latency summary (ms); empty until the firmware echoes sequence ids."""
+        return self.ack_stats.summary().get("ack_rtt", {})
+
+    def register_metrics(self, registry, prefix="serial"):
+        """Expose link counters as callback metrics (modules.metrics); nothing is added to the read path."""
+        registry.counter(f"{prefix}.bytes", lambda: self.bytes_read)
+        registry.counter(f"{prefix}.samples", lambda: self.samples.count)
+        registry.counter(f"{prefix}.parse_errors", lambda: self.parse_errors)
+        registry.counter(f"{prefix}.commands_coalesced", lambda: self.coalesced)
+        registry.counter(f"{prefix}.commands_dropped", lambda: self.dropped_commands)
+        registry.gauge(f"{prefix}.ack_rtt_ms", self.get_command_latency)
+
+    def _detect_protocol(self, port):
+        """
+        Watch the traffic until detect_protocol() classifies it, however long
+        the board stays silent after the port opens. Returns the bytes seen.
+        """
+        seen = bytearray()
+        while self.is_connected and port is self.serial_port and self.protocol is None:
+            seen += self._read_chunk(port)
+            self.protocol = detect_protocol(seen)
+        return bytes(seen)
+
+    def _read_serial(self):
+        port = self.serial_port
+        self._line_buf = bytearray()
+        self._decoder = BinaryDecoder()
+        chunk = b''
+        if self.protocol is None:
             try:
-                self.serial_port.write(cmd.encode())
-                print(f"Sent: {cmd}")
-                return True
+                chunk = self._detect_protocol(port)
             except Exception as e:
-                print(f"Send Error: {e}")
-                return False
-        return False
+                log.warning("serial read failed: %s", e)
+                self.protocol = "ascii"
 
-    def _read_serial(self):
-        while self.is_connected and self.serial_port:
+        while self.is_connected and port is self.serial_port:
             try:
-                if self.serial_port.in_waiting > 0:
-                    line = self.serial_port.readline().decode('utf-8').strip()
-                    # Expecting format like "Dist: 45" or just "45"
-                    with self.lock:
-                        if "Dist" in line:
-                            parts = line.split(':')
-                            if len(parts) > 1:
-                                self.ultrasonic_distance = float(parts[1].strip())
-                        elif line.replace('.', '', 1).isdigit():
-                            self.ultrasonic_distance = float(line)
+                if chunk:
+                    if self.protocol == "binary":
+                        self._handle_binary(chunk)
+                    else:
+                        self._handle_ascii(chunk)
+                # Blocks until at least one byte arrives (or READ_TIMEOUT),
+                # then takes everything the OS has buffered in one call.
+                chunk = self._read_chunk(port)
             except Exception as e:
-                print(f"Serial Read Error: {e}")
-            time.sleep(0.05)
+                log.warning("serial read failed: %s", e)
+                chunk = b''
+                time.sleep(0.05)
+
+    def _read_chunk(self, port):
+        chunk = port.read(max(1, port.in_waiting))
+        self.bytes_read += len(chunk)
+        recorder = self.recorder
+        if chunk and recorder is not None:
+            recorder.serial.write(chunk)
+        return chunk
+
+    def feed(self, chunk, t=None):
+        """
+        Parse raw bytes as if they had been read from the port, with samples
+        stamped t (default now). Decodes serial recordings offline; unless
+        the protocol is set, chunks are held back until detect_protocol()
+        classifies them, as the live reader does.
+        """
+        if self.protocol is None:
+            self._detect_buf += chunk
+            self.protocol = detect_protocol(self._detect_buf)
+            if self.protocol is None:
+                return
+            chunk = bytes(self._detect_buf)
+            self._detect_buf.clear()
+        if self.protocol == "binary":
+            self._handle_binary(chunk, t)
+        else:
+            self._handle_ascii(chunk, t)
+
+    def _handle_ascii(self, chunk, now=None):
+        buf = self._line_buf
+        buf += chunk
+
+        end = buf.rfind(b'\n')
+        if end < 0:
+            if len(buf) > MAX_LINE_LENGTH:
+                buf.clear()
+            return
+
+        # Parse every complete line, keep the partial tail for next time.
+        # Expecting format like "Dist: 45" or just "45"
+        # A bulk read holds lines that arrived over a while: each is stamped
+        # `now` minus the transmission time of the bytes that followed it.
+        now = time.time() if now is None else now
+        byte_time = 10.0 / self.baudrate  # start + 8 data + stop bits
+        size = len(buf)
+        offset = 0
+        readings = []
+        acks = []
+        for line in buf[:end].split(b'\n'):
+            offset += len(line) + 1
+            t = now - (size - offset) * byte_time
+            if line.startswith(b"ACK"):
+                # Echoed sequence id, e.g. "ACK:12"
+                acks.append(line[4:].strip() or b'-1')
+                continue
+            try:
+                value = parse_distance_line(line)
+            except ValueError:
+                self.parse_errors += 1
+                continue
+            if value is not None:
+                readings.append((t, value))
+        del buf[:end + 1]
+
+        if acks:
+            self._acknowledge(acks)
+        if readings:
+            with self.lock:
+                for t, value in readings:
+                    # Never behind the previous sample: get_samples(since) relies on ordered stamps
+                    t = self._last_stamp = max(t, self._last_stamp + 1e-6)
+                    self.samples.append(t, value)
+                self.ultrasonic_distance = readings[-1][1]
+
+    def _handle_binary(self, chunk, now=None):
+        messages = self._decoder.feed(chunk)
+        if not messages:
+            return
+        now = time.time() if now is None else now
+
+        if MSG_ACK in messages:
+            self._acknowledge(decode_u16(messages[MSG_ACK]).tolist())
+
+        with self.lock:
+            if MSG_TELEMETRY in messages:
+                records = decode_telemetry(messages[MSG_TELEMETRY])
+                times = np.full(len(records), now)
+                ranges = records['range_mm'] / 10.0
+                accel = records['accel_mg'] / 1000.0
+                gyro = records['gyro_cdps'] / 100.0
+                for i, name in enumerate(RANGE_NAMES):
+                    self.channels[name].extend(times, ranges[:, i])
+                for i, name in enumerate(IMU_NAMES[:3]):
+                    self.channels[name].extend(times, accel[:, i])
+                for i, name in enumerate(IMU_NAMES[3:]):
+                    self.channels[name].extend(times, gyro[:, i])
+                self.channels["battery_v"].extend(times, records['battery_mv'] / 1000.0)
+
+            for payload in messages.get(MSG_RANGES, ()):
+                for name, value in zip(RANGE_NAMES, decode_ranges(payload)):
+                    self.channels[name].append(now, value)
+
+            if MSG_BATTERY in messages:
+                volts = decode_u16(messages[MSG_BATTERY]) / 1000.0
+                self.channels["battery_v"].extend(np.full(len(volts), now), volts)
+
+            latest = self.samples.latest()
+            if latest is not None:
+                self.ultrasonic_distance = latest[1]
 
     def get_distance(self):
         with self.lock:
             return self.ultrasonic_distance
+
+    def get_samples(self, since=None):
+        """(timestamps, distances) NumPy arrays of readings newer than `since` (time.time() seconds)."""
+        with self.lock:
+            return self.samples.since(since)
+
+    def get_channel(self, name, since=None):
+        """Like get_samples() for any telemetry channel in CHANNELS."""
+        with self.lock:
+            return self.channels[name].since(since)
+
+    def get_latest(self, name):
+        """(timestamp, value) of the newest sample on a channel, or None."""
+        with self.lock:
+            return self.channels[name].latest()
@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+import numpy as np
+
+# --- LOCAL MAP ---
+# Robot-centred grid: the robot sits in the centre cell facing "up" (row 0
+# side). Bearings are radians from straight ahead, positive to the right,
+# matching the radar view and VisionSystem detection bearings.
+
+ULTRASONIC_BEAM = math.radians(15)  # HC-SR04 style cone
+
+class OccupancyGrid:
+    """
+    Fixed-size log-odds occupancy grid fused from ultrasonic ranges and
+    camera detections. Every cell keeps its log-odds and the time it was
+    last touched; decay towards "unknown" is applied lazily when a cell is
+    updated or queried, so an update costs O(cells on its rays) instead of
+    a pass over the whole grid. Thread-safe.
+    """
+    def __init__(self, size=161, cell_cm=5.0, half_life=3.0, l_occupied=0.85, l_free=-0.4, l_limit=5.0,
+                 occupied_threshold=0.7, sectors=36):
+        self.size = size
+        self.cell_cm = cell_cm
+        self.max_range = (size // 2) * cell_cm
+        self.half_life = half_life        # seconds for a cell's evidence to halve
+        self.l_occupied = l_occupied
+        self.l_free = l_free
+        self.l_limit = l_limit
+        self.l_threshold = math.log(occupied_threshold / (1.0 - occupied_threshold))
+        self.sectors = sectors
+        self.sector_width = 2 * math.pi / sectors
+        self.sector_angles = np.arange(sectors) * self.sector_width
+
+        # Flat cell arrays
+        self.logodds = np.zeros(size * size, np.float32)
+        self.stamp = np.zeros(size * size, np.float64)
+        self._lock = threading.Lock()
+
+        # Static geometry of every cell, used by the sector query
+        c = size // 2
+        rows, cols = np.mgrid[0:size, 0:size]
+        x = ((cols - c) * cell_cm).ravel()
+        y = ((c - rows) * cell_cm).ravel()
+        self._range = np.hypot(x, y)
+        self._sector = np.round(np.arctan2(x, y) / self.sector_width).astype(np.intp) % sectors
+
+    def _cells(self, x, y):
+        c = self.size // 2
+        col = np.floor(x / self.cell_cm + 0.5).astype(np.intp) + c
+        row = c - np.floor(y / self.cell_cm + 0.5).astype(np.intp)
+        inside = (col >= 0) & (col < self.size) & (row >= 0) & (row < self.size)
+        return row[inside] * self.size + col[inside]
+
+    def _decay(self, cells, t):
+        return np.exp2(-(t - self.stamp[cells]) / self.half_life).astype(np.float32)
+
+    def _apply(self, cells, delta, t):
+        if len(cells) == 0:
+            return
+        values = self.logodds[cells] * self._decay(cells, t) + delta
+        self.logodds[cells] = np.clip(values, -self.l_limit, self.l_limit)
+        self.stamp[cells] = t
+
+    def integrate(self, bearings, ranges, t=None):
+        """
+        Fuse a batch of range readings along the given bearings (arrays).
+        Cells in front of each reading become freer, the cell at the reading
+        more occupied. Readings at or beyond max_range only clear space.
+        A batch counts as one observation per touched cell.
+        """
+        bearings = np.asarray(bearings, np.float64).ravel()
+        ranges = np.asarray(ranges, np.float64).ravel()
+        valid = np.isfinite(ranges) & (ranges > 0)
+        bearings, ranges = bearings[valid], ranges[valid]
+        if len(ranges) == 0:
+            return
+        t = time.time() if t is None else t
+        sin, cos = np.sin(bearings), np.cos(bearings)
+
+        hit = ranges < self.max_range
+        hits = np.unique(self._cells(sin[hit] * ranges[hit], cos[hit] * ranges[hit]))
+
+        # Free space: points every half cell up to one cell before the reading
+        reach = np.minimum(ranges, self.max_range) - self.cell_cm
+        steps = np.arange(0.0, max(reach.max(), 0.0), self.cell_cm / 2)
+        along = np.broadcast_to(steps, (len(ranges), len(steps)))
+        inside = along < reach[:, None]
+        free = self._cells((sin[:, None] * along)[inside], (cos[:, None] * along)[inside])
+        free = np.setdiff1d(free, hits, assume_unique=False)
+
+        with self._lock:
+            self._apply(free, self.l_free, t)
+            self._apply(hits, self.l_occupied, t)
+
+    def update_ultrasonic(self, times, distances, bearing=0.0, beam_width=ULTRASONIC_BEAM, rays=5):
+        """Timestamped ultrasonic readings (cm); each reading marks the arc across the sensor cone."""
+        distances = np.asarray(distances, np.float64)
+        if len(distances) == 0:
+            return
+        offsets = np.linspace(-beam_width / 2, beam_width / 2, rays)
+        self.integrate(np.tile(bearing + offsets, len(distances)),
+                       np.repeat(distances, rays), float(np.max(times)))
+
+    def update_detections(self, bearings, distances, t=None):
+        """Camera detections with a known distance (cm); NaN distances are ignored."""
+        self.integrate(bearings, distances, t)
+
+    def nearest_per_sector(self, t=None):
+        """Distance (cm) to the nearest occupied cell in each of `sectors` bearings around the robot, inf if none."""
+        t = time.time() if t is None else t
+        nearest = np.full(self.sectors, np.inf)
+        with self._lock:
+            # Decay only shrinks evidence, so undecayed values pre-select the candidates
+            cells = np.flatnonzero(self.logodds > self.l_threshold)
+            cells = cells[self.logodds[cells] * self._decay(cells, t) > self.l_threshold]
+        np.minimum.at(nearest, self._sector[cells], self._range[cells])
+        return nearest
+
+    def probabilities(self, t=None):
+        """Decayed occupancy probability of every cell as a (size, size) array (full-grid pass, for display/debug)."""
+        t = time.time() if t is None else t
+        with self._lock:
+            l = self.logodds * np.exp2(-(t - self.stamp) / self.half_life)
+        return (1.0 / (1.0 + np.exp(-l))).reshape(self.size, self.size)
+
+    def clear(self):
+        with self._lock:
+            self.logodds[:] = 0
+            self.stamp[:] = 0
@@ -1,18 +1,23 @@
 import tkinter as tk
 from tkinter import Label, Button, Frame, Scale, HORIZONTAL, StringVar, OptionMenu
-from PIL import Image, ImageTk
 import threading
-import time
 import queue
+import time
+import os
+import logging
 
 # Import Modules
+# Heavy modules (OpenCV, matplotlib, the detection model) are imported by
+# ModernApp._warm_up after the window is up, see "Staged startup" below.
 from modules.comms import CommunicationManager
-from modules.vision import VisionSystem
-from modules.visualizer import SensorVisualizer
+from modules.fusion import OccupancyGrid
+from modules.metrics import REGISTRY, MetricsExporter, SamplingProfiler, format_snapshot
 from modules.utils import KNOWN_WIDTHS, DEFAULT_FOCAL_LENGTH
 
+log = logging.getLogger(__name__)
+
 class ModernApp:
-    def __init__(self, root):
+    def __init__(self, root, vision_process=False):
         self.root = root
         self.root.title("Spider Bot | Advanced Vision & Control")
         self.root.geometry("1400x900")
@@ -20,15 +25,41 @@ class ModernApp:
 
         # --- Modules ---
         self.comms = CommunicationManager()
-        self.vision = VisionSystem()
-        
+        self.comms.register_metrics(REGISTRY)
+        # Built by the background warm-up; vision_process runs the pipeline
+        # in a worker process (modules.worker)
+        self.vision = None
+        self.vision_process = vision_process
+        self.visualizer = None
+        self.rgb_view = None
+        self.thermal_view = None
+
+        # Local map fused from the ultrasonic samples and camera detections
+        self.local_map = OccupancyGrid()
+        self._map_since = None
+        self._map_seq = 0
+        self._plot_since = None  # newest sample already handed to the visualizer
+
         # --- State ---
         self.camera_mode = "BOTH" # RGB, THERMAL, BOTH
         self.running = False
+        self._start_requested = False
+        self._t_launch = time.perf_counter()
+        self._startup = queue.Queue()
+
+        # --- Instrumentation ---
+        self.profiler = SamplingProfiler()
+        self._tick_ms = REGISTRY.histogram("gui.tick_ms")
+        self._tick_jitter_ms = REGISTRY.histogram("gui.tick_jitter_ms")
+        self._last_tick = None
+        self._metrics_refresh = 0.0
 
         # --- UI Setup ---
         self.setup_ui()
-        
+
+        # --- Staged startup: UI first, heavy imports and model in the background ---
+        threading.Thread(target=self._warm_up, daemon=True).start()
+
         # --- Start Update Loop ---
         self.update_gui()
 
@@ -41,6 +72,8 @@ class ModernApp:
         # Header
         Label(sidebar, text="SPIDER BOT", font=("Segoe UI", 24, "bold"), fg="#00e676", bg="#1a1a1a").pack(pady=(40, 5))
         Label(sidebar, text="Command Center", font=("Segoe UI", 12), fg="#888", bg="#1a1a1a").pack()
+        self.lbl_startup = Label(sidebar, text="Starting...", font=("Segoe UI", 9), fg="#888", bg="#1a1a1a")
+        self.lbl_startup.pack(pady=(5, 0))
 
         # Divider
         Frame(sidebar, bg="#333", height=1).pack(fill=tk.X, padx=20, pady=20)
@@ -88,6 +121,13 @@ class ModernApp:
         exit_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=20, pady=20)
         self.create_button(exit_frame, "EXIT APPLICATION", "#b71c1c", self.on_closing).pack(fill=tk.X)
 
+        # Diagnostics
+        diag_frame = Frame(sidebar, bg="#1a1a1a")
+        diag_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=20)
+        self.create_button(diag_frame, "Performance Overlay", "#333", self.toggle_metrics).pack(fill=tk.X, pady=2)
+        self.btn_profiler = self.create_button(diag_frame, "Start Profiler", "#333", self.toggle_profiler)
+        self.btn_profiler.pack(fill=tk.X, pady=2)
+
         # Robot Control
         Label(sidebar, text="MANUAL CONTROL", font=("Segoe UI", 10, "bold"), fg="#ccc", bg="#1a1a1a", anchor="w").pack(fill=tk.X, padx=20, pady=(30, 10))
         
@@ -111,12 +151,18 @@ class ModernApp:
         self.rgb_label = Label(self.cam_container, text="RGB FEED OFF", bg="black", fg="#333", font=("Segoe UI", 20))
         self.thermal_label = Label(self.cam_container, text="THERMAL FEED OFF", bg="black", fg="#333", font=("Segoe UI", 20))
 
-        # Bottom: Visualizer
-        vis_frame = Frame(main_content, bg="#1a1a1a", height=300)
-        vis_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(20, 0))
-        vis_frame.pack_propagate(False)
-        
-        self.visualizer = SensorVisualizer(vis_frame)
+        # Performance overlay (hidden until toggled)
+        self.metrics_label = Label(self.cam_container, text="", bg="#000", fg="#00e676", font=("Consolas", 9),
+                                   justify=tk.LEFT, anchor="nw")
+        self.metrics_visible = False
+
+        # Bottom: Visualizer (the plots are added once matplotlib is loaded)
+        self.vis_frame = Frame(main_content, bg="#1a1a1a", height=300)
+        self.vis_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=(20, 0))
+        self.vis_frame.pack_propagate(False)
+        self.vis_placeholder = Label(self.vis_frame, text="Loading sensor plots...", bg="#1a1a1a", fg="#555",
+                                     font=("Segoe UI", 12))
+        self.vis_placeholder.pack(expand=True)
 
         # Initial Layout
         self.set_cam_mode("BOTH")
@@ -168,50 +214,163 @@ class ModernApp:
             self.btn_connect.config(text="Connect", bg="#0277bd")
             self.lbl_status.config(text="Disconnected", fg="#777")
 
+    def _warm_up(self):
+        # Background thread: no Tk calls here, every result goes through self._startup
+        try:
+            self._startup.put(("status", "Loading sensor plots..."))
+            from modules.visualizer import SensorVisualizer
+            self._startup.put(("visualizer", SensorVisualizer))
+
+            self._startup.put(("status", "Loading OpenCV..."))
+            from modules.transport import FrameView
+            self._startup.put(("views", FrameView))
+
+            self._startup.put(("status", "Loading detection model..."))
+            from modules.calibration import DEFAULT_CALIBRATION_PATH
+            calibration = DEFAULT_CALIBRATION_PATH if os.path.exists(DEFAULT_CALIBRATION_PATH) else None
+            if self.vision_process:
+                # The worker loads and warms up its own model when started
+                from modules.worker import VisionProcess
+                vision = VisionProcess(calibration=calibration)
+            else:
+                from modules.vision import VisionSystem
+                vision = VisionSystem(calibration=calibration)
+                self._startup.put(("status", "Warming up detection model..."))
+                vision.warm_up()
+            self._startup.put(("vision", vision))
+        except Exception as e:
+            log.exception("vision startup failed")
+            self._startup.put(("error", str(e)))
+
+    def _poll_startup(self):
+        while True:
+            try:
+                kind, value = self._startup.get_nowait()
+            except queue.Empty:
+                return
+            if kind == "status":
+                self.lbl_startup.config(text=value, fg="#888")
+            elif kind == "visualizer":
+                self.vis_placeholder.destroy()
+                self.visualizer = value(self.vis_frame)
+                self.visualizer.set_local_map(self.local_map)
+                self.visualizer.register_metrics(REGISTRY)
+            elif kind == "views":
+                self.rgb_view = value(self.rgb_label)
+                self.thermal_view = value(self.thermal_label)
+            elif kind == "vision":
+                self.vision = value
+                self.vision.register_metrics(REGISTRY)
+                elapsed = time.perf_counter() - self._t_launch
+                log.info("vision ready %.1f s after launch", elapsed)
+                self.lbl_startup.config(text=f"Vision ready ({elapsed:.1f} s)", fg="#4caf50")
+                if self._start_requested:
+                    self.start_system()
+            else:
+                self.lbl_startup.config(text=f"Vision unavailable: {value}", fg="red")
+
     def start_system(self):
+        if self.vision is None:
+            # Still warming up; start as soon as the model is loaded
+            self._start_requested = True
+            self.lbl_startup.config(text="Starting once the model is loaded...", fg="#ffb300")
+            return
         if not self.running:
             self.running = True
             self.vision.start()
 
     def stop_system(self):
+        self._start_requested = False
         self.running = False
-        self.vision.stop()
-        self.rgb_label.config(image='')
-        self.thermal_label.config(image='')
+        if self.vision is not None:
+            self.vision.stop()
+            self.rgb_view.clear()
+            self.thermal_view.clear()
+
+    def toggle_metrics(self):
+        self.metrics_visible = not self.metrics_visible
+        if self.metrics_visible:
+            self.metrics_label.place(relx=1.0, rely=0.0, anchor="ne")
+            self.metrics_label.lift()
+        else:
+            self.metrics_label.place_forget()
+
+    def toggle_profiler(self):
+        if self.profiler.running:
+            self.profiler.stop()
+            self.profiler.dump("profile.folded")
+            self.btn_profiler.config(text="Start Profiler")
+            log.info("profile written to profile.folded (%d samples)", self.profiler.samples)
+        else:
+            self.profiler.reset()
+            self.profiler.start()
+            self.btn_profiler.config(text="Stop Profiler")
+
+    def update_metrics_overlay(self, now):
+        if not self.metrics_visible or now < self._metrics_refresh:
+            return
+        self._metrics_refresh = now + 0.5
+        profile = self.profiler.top(8) if self.profiler.running else None
+        self.metrics_label.config(text=format_snapshot(REGISTRY.snapshot(), profile))
 
     def update_gui(self):
+        t0 = time.perf_counter()
+        if self._last_tick is not None:
+            self._tick_jitter_ms.record(max(0.0, (t0 - self._last_tick) * 1000.0 - 30))
+        self._last_tick = t0
+
+        self._poll_startup()
         if self.running:
-            # Update RGB
-            try:
-                img = self.vision.frame_queue.get_nowait()
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.rgb_label.imgtk = imgtk
-                self.rgb_label.configure(image=imgtk)
-            except queue.Empty:
-                pass
+            # Update RGB (in place, only when a new frame was published)
+            if self.camera_mode != "THERMAL":
+                self.rgb_view.update(self.vision.frame_channel)
 
             # Update Thermal
-            try:
-                img_t = self.vision.thermal_queue.get_nowait()
-                imgtk_t = ImageTk.PhotoImage(image=img_t)
-                self.thermal_label.imgtk = imgtk_t
-                self.thermal_label.configure(image=imgtk_t)
-            except queue.Empty:
-                pass
+            if self.camera_mode != "RGB":
+                self.thermal_view.update(self.vision.thermal_channel)
 
-            # Update Sensors
-            dist = self.comms.get_distance()
-            self.visualizer.update(dist)
+            # Update Sensors: every sample since the last tick, not just the latest
+            self.update_local_map()
+            times, distances = self.comms.get_samples(self._plot_since)
+            if len(times):
+                self._plot_since = times[-1]
+            if self.visualizer is not None:
+                self.visualizer.add_samples(distances)
+                self.visualizer.update()
 
+        self.update_metrics_overlay(t0)
+        self._tick_ms.record((time.perf_counter() - t0) * 1000.0)
         self.root.after(30, self.update_gui)
 
+    def update_local_map(self):
+        # Only samples and detections that arrived since the last tick
+        times, distances = self.comms.get_samples(self._map_since)
+        if len(times):
+            self._map_since = times[-1]
+            self.local_map.update_ultrasonic(times, distances)
+
+        got = self.vision.get_detections(next(iter(self.vision.rgb_sources)), self._map_seq)
+        if got is not None:
+            self._map_seq, t, rows = got
+            # bearing and distance columns of modules.vision.DETECTION_FIELDS
+            self.local_map.update_detections(rows[:, 9], rows[:, 5], t)
+
     def on_closing(self):
         self.stop_system()
         self.comms.disconnect()
+        close = getattr(self.vision, "close", None)
+        if close is not None:
+            close()
         self.root.destroy()
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     root = tk.Tk()
-    app = ModernApp(root)
+    app = ModernApp(root, vision_process=os.environ.get("SPIDERBOT_VISION_PROCESS") == "1")
+    # Optional metrics export: a JSON file rewritten every second and/or a local HTTP endpoint
+    metrics_port = os.environ.get("SPIDERBOT_METRICS_PORT")
+    if os.environ.get("SPIDERBOT_METRICS_FILE") or metrics_port:
+        MetricsExporter(REGISTRY, path=os.environ.get("SPIDERBOT_METRICS_FILE"),
+                        port=int(metrics_port) if metrics_port else None).start()
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
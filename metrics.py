@@ -0,0 +1,289 @@
+import bisect
+import collections
+import json
+import math
+import os
+import sys
+import threading
+import time
+from .utils import get_logger
+
+log = get_logger(__name__)
+
+# --- METRICS ---
+# Counters and histograms cheap enough for hot paths (a few hundred ns,
+# no locks: concurrent updates may very rarely lose a count), plus
+# callback metrics that read state components already keep, so they cost
+# nothing until a snapshot is taken. Components expose
+# register_metrics(registry); REGISTRY is the process-wide default.
+
+HISTOGRAM_BOUNDS = [0.001 * 1.2 ** i for i in range(120)]  # ~20 % buckets, 1 us .. ~3 min in ms
+
+class Counter:
+    """Monotonic count; with fn the value is read from fn() at snapshot time."""
+    def __init__(self, fn=None):
+        self.fn = fn
+        self._value = 0
+        self._rate = 0.0
+        self._mark = None  # (time, value) the rate is measured from
+
+    def inc(self, n=1):
+        self._value += n
+
+    @property
+    def value(self):
+        return self.fn() if self.fn is not None else self._value
+
+    def rate(self, now=None):
+        """Per-second rate, re-measured at most once a second."""
+        now = time.monotonic() if now is None else now
+        value = self.value
+        if self._mark is None:
+            self._mark = (now, value)
+        elif now - self._mark[0] >= 1.0:
+            self._rate = (value - self._mark[1]) / (now - self._mark[0])
+            self._mark = (now, value)
+        return self._rate
+
+class Histogram:
+    """Log-bucketed distribution with O(log buckets) record() and approximate percentiles."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(HISTOGRAM_BOUNDS[i] if i < len(HISTOGRAM_BOUNDS) else math.inf, self.max)
+        return 0.0
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": self.total / self.count, "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95), "p99": self.percentile(0.99), "max": self.max}
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def counter(self, name, fn=None):
+        with self._lock:
+            metric = self.counters.get(name)
+            if metric is None:
+                metric = self.counters[name] = Counter(fn)
+            elif fn is not None:
+                metric.fn = fn
+            return metric
+
+    def histogram(self, name):
+        with self._lock:
+            metric = self.histograms.get(name)
+            if metric is None:
+                metric = self.histograms[name] = Histogram()
+            return metric
+
+    def gauge(self, name, fn):
+        """Any JSON-serialisable value computed by fn() at snapshot time."""
+        with self._lock:
+            self.gauges[name] = fn
+
+    def remove(self, prefix):
+        with self._lock:
+            for table in (self.counters, self.histograms, self.gauges):
+                for name in [n for n in table if n.startswith(prefix)]:
+                    del table[name]
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            counters, histograms, gauges = dict(self.counters), dict(self.histograms), dict(self.gauges)
+        values = {}
+        for name, fn in gauges.items():
+            try:
+                values[name] = fn()
+            except Exception as e:
+                values[name] = f"error: {e}"
+        return {
+            "time": time.time(),
+            "counters": {name: {"value": c.value, "rate": c.rate(now)} for name, c in counters.items()},
+            "histograms": {name: h.summary() for name, h in histograms.items()},
+            "gauges": values,
+        }
+
+REGISTRY = MetricsRegistry()
+
+def format_snapshot(snapshot, profile=None):
+    """Plain-text rendering of a snapshot (and optional profiler top list) for the dashboard."""
+    lines = []
+    for name, c in sorted(snapshot["counters"].items()):
+        lines.append(f"{name:<28}{c['value']:>10}  {c['rate']:8.1f}/s")
+    for name, h in sorted(snapshot["histograms"].items()):
+        if h["count"]:
+            lines.append(f"{name:<28}p50 {h['p50']:7.2f}  p95 {h['p95']:7.2f}  max {h['max']:7.2f}")
+    for name, value in sorted(snapshot["gauges"].items()):
+        if isinstance(value, dict):
+            value = "  ".join(f"{k} {v:.2f}" if isinstance(v, float) else f"{k} {v}" for k, v in value.items())
+        elif isinstance(value, float):
+            value = f"{value:.2f}"
+        lines.append(f"{name:<28}{value}")
+    if profile:
+        lines.append("")
+        lines.append("profiler (share of samples)")
+        for frame, share in profile:
+            lines.append(f"  {share * 100:5.1f}%  {frame}")
+    return "\n".join(lines)
+
+# --- SAMPLING PROFILER ---
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads every `interval` seconds from a
+    background thread (sys._current_frames), so it can be switched on and
+    off on a live process. Overhead is proportional to the sampling rate,
+    not to the code being profiled.
+    """
+    def __init__(self, interval=0.005, max_depth=32):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _sample(self):
+        own = threading.get_ident()
+        while self._running:
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    self._stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    def top(self, n=10):
+        """[(function, share of samples)] for the innermost frames seen most often."""
+        with self._lock:
+            leaves = collections.Counter()
+            for stack, count in self._stacks.items():
+                if stack:
+                    leaves[stack[-1]] += count
+            total = sum(leaves.values())
+        return [(frame, count / total) for frame, count in leaves.most_common(n)] if total else []
+
+    def dump(self, path):
+        """Write collapsed stacks ("a;b;c count" lines, flamegraph.pl / speedscope format)."""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        with open(path, "w") as f:
+            for stack, count in stacks:
+                f.write(f"{';'.join(stack)} {count}\n")
+
+# --- EXPORT ---
+class MetricsExporter:
+    """
+    Publishes registry snapshots: rewritten atomically to a JSON file
+    every `interval` seconds, and/or served on http://127.0.0.1:<port>/metrics
+    (JSON) for scraping from another machine through an SSH tunnel.
+    """
+    def __init__(self, registry=REGISTRY, path=None, port=None, interval=1.0, host="127.0.0.1"):
+        self.registry = registry
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self._stop = threading.Event()
+        self._server = None
+
+    def start(self):
+        self._stop.clear()
+        if self.path:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+        if self.port:
+            from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") not in ("", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = json.dumps(registry.snapshot(), default=str).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            log.info("metrics on http://%s:%d/metrics", self.host, self.port)
+        return self
+
+    def _write_loop(self):
+        tmp = self.path + ".tmp"
+        while not self._stop.wait(self.interval):
+            try:
+                with open(tmp, "w") as f:
+                    json.dump(self.registry.snapshot(), f, default=str)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                log.warning("writing metrics failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,164 @@
+import threading
+import time
+import collections
+import numpy as np
+
+class FramePacket:
+    """A frame travelling through the vision pipeline."""
+    __slots__ = ("seq", "frame", "timestamp", "results", "detections", "queued_at")
+
+    def __init__(self, seq, frame, timestamp):
+        self.seq = seq
+        self.frame = frame
+        self.timestamp = timestamp  # perf_counter() at capture
+        self.results = None
+        self.detections = None
+        self.queued_at = timestamp  # perf_counter() when last handed to a slot
+
+class LatestSlot:
+    """
+    Single-item handoff between two pipeline stages.
+    A new put() replaces whatever the consumer has not picked up yet,
+    so a slow stage always works on the freshest frame.
+    """
+    def __init__(self, ready_event=None, on_drop=None):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+        # Optional event shared by several slots, set on every put()
+        self._ready_event = ready_event
+        # Optional callback(item) for items replaced before they were picked up
+        self.on_drop = on_drop
+
+    def put(self, item, replace=None):
+        """
+        replace: optional predicate on the pending item; when it returns
+        False the pending item is kept and `item` is dropped instead.
+        Returns whether `item` was accepted.
+        """
+        with self._cond:
+            old = self._item
+            accepted = old is None or replace is None or replace(old)
+            if accepted:
+                self._item = item
+                self._cond.notify()
+            else:
+                old = item
+            if old is not None:
+                self.dropped += 1
+        if old is not None and self.on_drop is not None:
+            self.on_drop(old)
+        if accepted and self._ready_event is not None:
+            self._ready_event.set()
+        return accepted
+
+    def get_nowait(self):
+        with self._cond:
+            item, self._item = self._item, None
+            return item
+
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None and not self._closed:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        # Wake up any consumer blocked in get()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reset(self):
+        with self._cond:
+            self._item = None
+            self._closed = False
+            self.dropped = 0
+
+class FramePool:
+    """
+    Recycled frame buffers, so capture writes into preallocated arrays
+    instead of allocating a frame per read. Buffers come back with
+    release() once the last stage is done with them; one that is never
+    released (pipeline stopped mid-flight) is simply garbage collected.
+    """
+    def __init__(self, max_free=8):
+        self.max_free = max_free
+        self.allocated = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, shape, dtype=np.uint8):
+        with self._lock:
+            for i, buf in enumerate(self._free):
+                if buf.shape == shape and buf.dtype == dtype:
+                    return self._free.pop(i)
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, buf):
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(buf)
+
+class FpsCounter:
+    """Frames per second, refreshed about once a second."""
+    def __init__(self):
+        self.fps = 0
+        self.frame_count = 0
+        self.start_time = time.time()
+
+    def reset(self):
+        self.fps = 0
+        self.frame_count = 0
+        self.start_time = time.time()
+
+    def tick(self):
+        self.frame_count += 1
+        elapsed = time.time() - self.start_time
+        if elapsed > 1:
+            self.fps = self.frame_count / elapsed
+            self.frame_count = 0
+            self.start_time = time.time()
+        return self.fps
+
+class StageStats:
+    """Rolling per-stage latency statistics (seconds in, milliseconds out)."""
+    def __init__(self, window=120):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            snapshot = {stage: (s[-1], sorted(s)) for stage, s in self._samples.items() if s}
+
+        out = {}
+        for stage, (last, samples) in snapshot.items():
+            n = len(samples)
+            out[stage] = {
+                "last_ms": last * 1000.0,
+                "mean_ms": sum(samples) / n * 1000.0,
+                "p50_ms": samples[n // 2] * 1000.0,
+                "p95_ms": samples[min(n - 1, int(n * 0.95))] * 1000.0,
+                "p99_ms": samples[min(n - 1, int(n * 0.99))] * 1000.0,
+                "max_ms": samples[-1] * 1000.0,
+                "count": n,
+            }
+        return out
+
+def elapsed_since(t0):
+    return time.perf_counter() - t0
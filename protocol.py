@@ -0,0 +1,116 @@
+import struct
+import binascii
+import numpy as np
+
+# --- BINARY TELEMETRY FRAMING ---
+# Every frame on the wire:
+#   SYNC (2 bytes) | type (u8) | payload length (u8) | payload | CRC-16 (u16, little-endian)
+# The CRC is CRC-16/CCITT-FALSE over type, length and payload.
+# All payload fields are little-endian and fixed width.
+
+SYNC = b'\xA5\x5A'
+HEADER = struct.Struct('<2sBB')
+CRC = struct.Struct('<H')
+MAX_PAYLOAD = 255
+
+MSG_RANGES = 0x01     # n x u16 distance in mm, one per ultrasonic sensor
+MSG_BATTERY = 0x03    # u16 millivolts
+MSG_ACK = 0x04        # u16 command sequence id echoed back by the firmware
+MSG_COMMAND = 0x05    # u16 sequence id + ASCII command (host -> robot)
+MSG_TELEMETRY = 0x10  # TELEMETRY_DTYPE: all sensors in one frame
+
+RANGE_CHANNELS = 4
+
+TELEMETRY_DTYPE = np.dtype([
+    ('t_ms', '<u4'),                         # device clock
+    ('range_mm', '<u2', (RANGE_CHANNELS,)),  # 0 = no echo / no sensor
+    ('accel_mg', '<i2', (3,)),               # milli-g, x y z
+    ('gyro_cdps', '<i2', (3,)),              # centi-degrees per second, x y z
+    ('battery_mv', '<u2'),
+])
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+def encode_frame(msg_type, payload):
+    """Build one frame; used by tests, replay tools and firmware simulators."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("payload too long")
+    body = bytes((msg_type, len(payload))) + payload
+    return SYNC + body + CRC.pack(crc16(body))
+
+def encode_telemetry(t_ms, ranges_mm, accel_mg=(0, 0, 0), gyro_cdps=(0, 0, 0), battery_mv=0):
+    record = np.zeros(1, dtype=TELEMETRY_DTYPE)
+    record['t_ms'] = t_ms
+    record['range_mm'][0, :len(ranges_mm)] = ranges_mm
+    record['accel_mg'] = accel_mg
+    record['gyro_cdps'] = gyro_cdps
+    record['battery_mv'] = battery_mv
+    return encode_frame(MSG_TELEMETRY, record.tobytes())
+
+def encode_command(seq, cmd):
+    return encode_frame(MSG_COMMAND, struct.pack('<H', seq & 0xFFFF) + cmd.encode())
+
+class BinaryDecoder:
+    """
+    Incremental frame decoder. feed() takes raw bytes from the port and
+    returns the complete, CRC-valid frames found so far as
+    {msg_type: [payload, ...]}; partial frames are kept for the next call.
+    """
+    def __init__(self):
+        self.buf = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+
+    def feed(self, data):
+        buf = self.buf
+        buf += data
+        messages = {}
+        pos = 0
+        n = len(buf)
+
+        while True:
+            start = buf.find(SYNC, pos)
+            if start < 0:
+                # Keep a trailing first sync byte, drop everything else
+                pos = n - 1 if n and buf[-1] == SYNC[0] else n
+                break
+            if start + HEADER.size > n:
+                pos = start
+                break
+            _, msg_type, length = HEADER.unpack_from(buf, start)
+            end = start + HEADER.size + length + CRC.size
+            if end > n:
+                pos = start
+                break
+
+            body = bytes(buf[start + 2:end - CRC.size])
+            (crc,) = CRC.unpack_from(buf, end - CRC.size)
+            if crc != crc16(body):
+                # False sync or corruption: resynchronise one byte further
+                self.crc_errors += 1
+                pos = start + 1
+                continue
+
+            messages.setdefault(msg_type, []).append(body[2:])
+            self.frames += 1
+            pos = end
+
+        del buf[:pos]
+        return messages
+
+def decode_telemetry(payloads):
+    """Stack TELEMETRY payloads into one structured array (zero-copy view over the joined bytes)."""
+    payloads = [p for p in payloads if len(p) == TELEMETRY_DTYPE.itemsize]
+    return np.frombuffer(b''.join(payloads), dtype=TELEMETRY_DTYPE)
+
+def decode_ranges(payload):
+    """Distances in cm from one RANGES payload."""
+    return np.frombuffer(payload, dtype='<u2', count=len(payload) // 2) / 10.0
+
+def decode_u16(payloads):
+    return np.frombuffer(b''.join(p[:2] for p in payloads if len(p) >= 2), dtype='<u2')
+
+def looks_binary(data):
+    """Protocol auto-detection: true if data holds at least one CRC-valid frame."""
+    return BinaryDecoder().feed(data) != {}
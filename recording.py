@@ -0,0 +1,219 @@
+import os
+import json
+import struct
+import threading
+import time
+import numpy as np
+
+# --- RECORDING LAYOUT ---
+# <directory>/
+#   <source name>/meta.json          frame shape, chunk size, frame count
+#   <source name>/times.npy          capture timestamp per frame (time.time())
+#   <source name>/chunk_00000.npy    (chunk_frames, H, W, C) uint8, memory-mapped
+#   serial.bin                       raw bytes as read from the port
+#   serial.idx                       SERIAL_INDEX_DTYPE record per read() call
+# Frames and serial reads share the time.time() clock, so streams stay in sync.
+
+SERIAL_INDEX_DTYPE = np.dtype([('t', '<f8'), ('offset', '<u8'), ('length', '<u4')])
+SERIAL_INDEX = struct.Struct('<dQI')
+
+class FrameRecorder:
+    """Appends frames of one source to chunked, memory-mapped .npy files."""
+    def __init__(self, directory, name, chunk_frames=256):
+        self.path = os.path.join(directory, name)
+        os.makedirs(self.path, exist_ok=True)
+        self.chunk_frames = chunk_frames
+        self.count = 0
+        self.shape = None
+        self.dtype = None
+        self._chunk = None
+        self._times = []
+        self._lock = threading.Lock()
+
+    def write(self, frame, t=None):
+        with self._lock:
+            if self.shape is None:
+                self.shape = frame.shape
+                self.dtype = frame.dtype  # uint8 camera frames, uint16 raw thermal
+            elif frame.shape != self.shape:
+                raise ValueError(f"frame shape changed from {self.shape} to {frame.shape}")
+
+            slot = self.count % self.chunk_frames
+            if slot == 0:
+                self._roll_chunk()
+            self._chunk[slot] = frame
+            self._times.append(time.time() if t is None else t)
+            self.count += 1
+
+    def _roll_chunk(self):
+        if self._chunk is not None:
+            self._chunk.flush()
+            self._write_index()
+        chunk_path = os.path.join(self.path, f"chunk_{self.count // self.chunk_frames:05d}.npy")
+        self._chunk = np.lib.format.open_memmap(
+            chunk_path, mode='w+', dtype=self.dtype, shape=(self.chunk_frames,) + tuple(self.shape))
+
+    def _write_index(self):
+        np.save(os.path.join(self.path, "times.npy"), np.asarray(self._times, dtype=np.float64))
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"count": self.count, "chunk_frames": self.chunk_frames,
+                       "shape": list(self.shape) if self.shape else None}, f)
+
+    def close(self):
+        with self._lock:
+            if self._chunk is not None:
+                self._chunk.flush()
+                self._chunk = None
+            self._write_index()
+
+class FrameRecording:
+    """Random access to a recorded source; chunks are memory-mapped on first use."""
+    def __init__(self, directory, name):
+        self.path = os.path.join(directory, name)
+        with open(os.path.join(self.path, "meta.json")) as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.chunk_frames = meta["chunk_frames"]
+        self.shape = tuple(meta["shape"]) if meta["shape"] else None
+        self.times = np.load(os.path.join(self.path, "times.npy"))[:self.count]
+        self._chunks = {}
+
+    def __len__(self):
+        return self.count
+
+    def frame(self, i):
+        n, slot = divmod(i, self.chunk_frames)
+        chunk = self._chunks.get(n)
+        if chunk is None:
+            chunk = self._chunks[n] = np.load(os.path.join(self.path, f"chunk_{n:05d}.npy"), mmap_mode='r')
+        return chunk[slot]
+
+class SerialRecorder:
+    """Logs every chunk read from the serial port with its arrival time."""
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self._data = open(os.path.join(directory, "serial.bin"), "ab")
+        self._index = open(os.path.join(directory, "serial.idx"), "ab")
+        self._offset = self._data.tell()
+        self._lock = threading.Lock()
+
+    def write(self, data, t=None):
+        with self._lock:
+            self._data.write(data)
+            self._index.write(SERIAL_INDEX.pack(time.time() if t is None else t, self._offset, len(data)))
+            self._offset += len(data)
+
+    def close(self):
+        with self._lock:
+            self._data.close()
+            self._index.close()
+
+class SerialRecording:
+    def __init__(self, directory):
+        self.index = np.fromfile(os.path.join(directory, "serial.idx"), dtype=SERIAL_INDEX_DTYPE)
+        self.data = np.memmap(os.path.join(directory, "serial.bin"), dtype=np.uint8, mode='r') \
+            if self.index.size else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.index)
+
+    def chunk(self, i):
+        rec = self.index[i]
+        start = int(rec['offset'])
+        return float(rec['t']), self.data[start:start + int(rec['length'])].tobytes()
+
+class Recorder:
+    """
+    One recording session: a FrameRecorder per camera source plus the
+    serial log, all in the same directory. Attach it with
+    VisionSystem.recorder / CommunicationManager.recorder.
+    """
+    def __init__(self, directory, chunk_frames=256):
+        self.directory = directory
+        self.chunk_frames = chunk_frames
+        os.makedirs(directory, exist_ok=True)
+        self._frames = {}
+        self._serial = None
+        self._lock = threading.Lock()
+
+    def frames(self, name):
+        with self._lock:
+            rec = self._frames.get(name)
+            if rec is None:
+                rec = self._frames[name] = FrameRecorder(self.directory, name, self.chunk_frames)
+            return rec
+
+    @property
+    def serial(self):
+        with self._lock:
+            if self._serial is None:
+                self._serial = SerialRecorder(self.directory)
+            return self._serial
+
+    def close(self):
+        with self._lock:
+            for rec in self._frames.values():
+                rec.close()
+            if self._serial is not None:
+                self._serial.close()
+
+class SerialReplayer:
+    """
+    Feeds a serial recording into a pseudo-terminal so CommunicationManager
+    can connect() to `port` exactly as to the real Arduino (POSIX only).
+    Bytes the application writes are read and discarded. connect() before
+    start(): opening the port flushes anything already fed.
+    """
+    def __init__(self, directory, realtime=True, loop=False):
+        self.recording = SerialRecording(directory)
+        self.realtime = realtime
+        self.loop = loop
+        self.running = False
+        self.finished = threading.Event()
+        import tty
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._feed, daemon=True).start()
+        threading.Thread(target=self._drain, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _feed(self):
+        while self.running:
+            if len(self.recording):
+                t_first = self.recording.chunk(0)[0]
+                t0 = time.perf_counter()
+                for i in range(len(self.recording)):
+                    if not self.running:
+                        break
+                    t, data = self.recording.chunk(i)
+                    if self.realtime:
+                        delay = t0 + (t - t_first) - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    try:
+                        os.write(self._master, data)
+                    except OSError:
+                        self.running = False
+            if not self.loop:
+                break
+        self.finished.set()
+
+    def _drain(self):
+        while self.running:
+            try:
+                os.read(self._master, 1024)
+            except OSError:
+                break
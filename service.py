@@ -0,0 +1,343 @@
+"""
+Headless service: VisionSystem and CommunicationManager without the Tk GUI.
+
+    python -m modules.service --serial COM3
+    python -m modules.service --serial /dev/ttyUSB0 --unix /run/spiderbot.sock --process
+
+Local API (asyncio):
+  * JSON lines on TCP (--api-port) and optionally a Unix socket (--unix).
+    Server -> client: {"type": "hello"}, {"type": "detections"}, {"type": "samples"}.
+    Client -> server: {"type": "command", "cmd": "F"} is routed to send_command();
+    {"type": "set", "name": "focal_length" | "target_class" | "focus", "value": ...};
+    {"type": "subscribe", "topics": ["detections", "samples"]}.
+  * MJPEG over HTTP (--mjpeg-port): /stream/<source> and /snapshot/<source>.
+    Each frame is JPEG-encoded once and shared by every viewer.
+Slow clients lose messages and frames; they never hold up the producers.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+import cv2
+import numpy as np
+from .utils import get_logger
+from .vision import VisionSystem, pack_detections
+
+log = get_logger(__name__)
+
+CLIENT_QUEUE_SIZE = 64     # messages buffered per API client before the oldest are dropped
+SAMPLE_INTERVAL = 0.05     # seconds between sensor sample batches
+DETECTION_POLL = 0.02      # seconds between detection polls of a worker process
+TOPICS = ("detections", "samples")
+
+class _Client:
+    """One API connection: a bounded outbox that drops its oldest message when full."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.topics = set(TOPICS)
+        self.outbox = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, topic, line):
+        """Queue a message line; topic None bypasses the subscription filter."""
+        if topic is not None and topic not in self.topics:
+            return
+        if self.outbox.full():
+            self.outbox.get_nowait()
+            self.dropped += 1
+        self.outbox.put_nowait(line)
+
+class StreamService:
+    def __init__(self, vision, comms, host="127.0.0.1", api_port=8765, mjpeg_port=8080, unix_path=None,
+                 jpeg_quality=80, max_stream_fps=15.0):
+        self.vision = vision
+        self.comms = comms
+        self.host = host
+        self.api_port = api_port
+        self.mjpeg_port = mjpeg_port
+        self.unix_path = unix_path
+        self.jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+        self.frame_interval = 1.0 / max_stream_fps
+        self.sources = list(vision.channels)
+        self.clients = set()
+
+        # Encode-once MJPEG state per source: (seq, jpeg bytes), viewer count and a wake-up condition
+        self._jpeg = {name: (0, None) for name in self.sources}
+        self._viewers = dict.fromkeys(self.sources, 0)
+        self._frame_cond = None
+        self._bgr = {}
+        self._loop = None
+
+    # --- PUBLISHING ---
+    def _broadcast(self, topic, message):
+        line = (json.dumps(message, separators=(",", ":")) + "\n").encode()
+        for client in self.clients:
+            client.offer(topic, line)
+
+    def _names(self):
+        backend = getattr(self.vision, "backend", None)
+        return backend.names if backend is not None else self.vision.names
+
+    def _publish_detections(self, name, seq, t, rows):
+        if not self.clients:
+            return
+        names = self._names()
+        objects = []
+        for x1, y1, x2, y2, cls, distance, band, target, track_id, bearing in rows.tolist():
+            objects.append({
+                "label": names.get(int(cls), str(int(cls))),
+                "box": [int(x1), int(y1), int(x2), int(y2)],
+                "distance": None if distance != distance else round(distance, 1),
+                "bearing": round(bearing, 4),
+                "target": bool(target),
+                "id": int(track_id),
+            })
+        self._broadcast("detections", {"type": "detections", "source": name, "seq": seq, "t": t,
+                                       "objects": objects})
+
+    def _on_detections(self, name, packet):
+        # Annotate thread of an in-process VisionSystem: hand over to the event loop
+        rows = pack_detections(packet.detections)
+        self._loop.call_soon_threadsafe(self._publish_detections, name, packet.seq, time.time(), rows)
+
+    async def _poll_detections(self):
+        # VisionProcess: detections arrive through its shared-memory rings
+        last = dict.fromkeys(self.vision.rgb_sources, 0)
+        while True:
+            for name in last:
+                got = self.vision.get_detections(name, last[name])
+                if got is not None:
+                    last[name], t, rows = got
+                    self._publish_detections(name, last[name], t, rows)
+            await asyncio.sleep(DETECTION_POLL)
+
+    async def _poll_samples(self):
+        from .comms import CHANNELS
+
+        since = time.time()
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            if not self.clients:
+                since = time.time()
+                continue
+            channels = {}
+            newest = since
+            for name in CHANNELS:
+                times, values = self.comms.get_channel(name, since)
+                if len(times):
+                    channels[name] = {"t": times.tolist(), "v": values.tolist()}
+                    newest = max(newest, float(times[-1]))
+            since = newest
+            if channels:
+                self._broadcast("samples", {"type": "samples", "channels": channels})
+
+    # --- API CLIENTS ---
+    def _handle_message(self, client, message):
+        if not isinstance(message, dict):
+            raise ValueError("expected a JSON object")
+        kind = message.get("type")
+        if kind == "command":
+            self.comms.send_command(str(message["cmd"]))
+        elif kind == "set":
+            name, value = message["name"], message.get("value")
+            if name == "focal_length":
+                self.vision.set_focal_length(value)
+            elif name == "target_class":
+                self.vision.set_target_class(value)
+            elif name == "focus":
+                self.vision.set_focus(value, message.get("roi"))
+            else:
+                raise ValueError(f"unknown setting {name!r}")
+        elif kind == "subscribe":
+            client.topics = set(message.get("topics", TOPICS)) & set(TOPICS)
+        else:
+            raise ValueError(f"unknown message type {kind!r}")
+
+    async def _send_loop(self, client):
+        while True:
+            line = await client.outbox.get()
+            client.writer.write(line)
+            await client.writer.drain()
+
+    async def _serve_api(self, reader, writer):
+        client = _Client(writer)
+        hello = {"type": "hello", "sources": self.sources, "classes": self._names(), "topics": list(TOPICS)}
+        client.offer(None, (json.dumps(hello, separators=(",", ":")) + "\n").encode())
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    self._handle_message(client, json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    client.offer(None, (json.dumps({"type": "error", "error": str(e)}) + "\n").encode())
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            writer.close()
+            if client.dropped:
+                log.info("API client dropped %d messages while connected", client.dropped)
+
+    # --- MJPEG ---
+    def _encode(self, name):
+        """Runs in the default executor: latest RGB frame of a channel -> JPEG bytes, or None."""
+        channel = self.vision.channels[name]
+        got = channel.acquire(self._jpeg[name][0])
+        if got is None:
+            return None
+        seq, rgb = got
+        try:
+            bgr = self._bgr.get(name)
+            if bgr is None or bgr.shape != rgb.shape:
+                bgr = self._bgr[name] = np.empty_like(rgb)
+            cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=bgr)
+        finally:
+            channel.release(rgb)
+        ok, jpeg = cv2.imencode(".jpg", bgr, self.jpeg_params)
+        return (seq, jpeg.tobytes()) if ok else None
+
+    async def _encode_frames(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            for name in self.sources:
+                if not self._viewers[name]:
+                    continue
+                encoded = await loop.run_in_executor(None, self._encode, name)
+                if encoded is not None:
+                    async with self._frame_cond:
+                        self._jpeg[name] = encoded
+                        self._frame_cond.notify_all()
+            await asyncio.sleep(max(0.0, self.frame_interval - (loop.time() - t0)))
+
+    async def _next_frame(self, name, last_seq):
+        # Latest wins: a viewer that was busy sending skips straight to the newest frame
+        async with self._frame_cond:
+            await self._frame_cond.wait_for(lambda: self._jpeg[name][0] != last_seq and self._jpeg[name][1])
+            return self._jpeg[name]
+
+    async def _serve_mjpeg(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            path = parts[1].strip("/").split("/") if len(parts) > 1 else []
+            kind = path[0] if path else ""
+            name = path[1] if len(path) > 1 else self.sources[0]
+            if kind not in ("stream", "snapshot") or name not in self._viewers:
+                writer.write(b"HTTP/1.0 404 Not Found\r\n\r\n")
+                return
+
+            self._viewers[name] += 1
+            try:
+                if kind == "snapshot":
+                    _, jpeg = await self._next_frame(name, None)
+                    writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: image/jpeg\r\n"
+                                 b"Content-Length: %d\r\n\r\n" % len(jpeg) + jpeg)
+                    return
+                writer.write(b"HTTP/1.0 200 OK\r\nCache-Control: no-cache\r\n"
+                             b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n\r\n")
+                seq = None
+                while True:
+                    seq, jpeg = await self._next_frame(name, seq)
+                    writer.write(b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpeg))
+                    writer.write(jpeg)
+                    writer.write(b"\r\n")
+                    await writer.drain()
+            finally:
+                self._viewers[name] -= 1
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # --- LIFECYCLE ---
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._frame_cond = asyncio.Condition()
+        servers = [await asyncio.start_server(self._serve_api, self.host, self.api_port),
+                   await asyncio.start_server(self._serve_mjpeg, self.host, self.mjpeg_port)]
+        if self.unix_path:
+            servers.append(await asyncio.start_unix_server(self._serve_api, self.unix_path))
+        log.info("API on %s:%d, MJPEG on http://%s:%d/stream/<source>",
+                 self.host, self.api_port, self.host, self.mjpeg_port)
+
+        # An in-process VisionSystem pushes every annotated frame; a VisionProcess
+        # only exposes the newest detections per source, so it is polled
+        push = isinstance(self.vision, VisionSystem)
+        tasks = [asyncio.ensure_future(self._encode_frames()), asyncio.ensure_future(self._poll_samples())]
+        if push:
+            self.vision.on_detections = self._on_detections
+        else:
+            tasks.append(asyncio.ensure_future(self._poll_detections()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if push:
+                self.vision.on_detections = None
+            for task in tasks:
+                task.cancel()
+            for server in servers:
+                server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Spider Bot perception stack without the GUI.")
+    parser.add_argument("--serial", help="serial port or pyserial URL of the robot")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--model", default="yolov8m.pt")
+    parser.add_argument("--backend", default="ultralytics")
+    parser.add_argument("--calibration", help="camera/distance calibration profile (.npz, see modules.calibration)")
+    parser.add_argument("--process", action="store_true", help="run the vision pipeline in a worker process")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--mjpeg-port", type=int, default=8080)
+    parser.add_argument("--unix", help="also serve the API on this Unix socket")
+    parser.add_argument("--jpeg-quality", type=int, default=80)
+    parser.add_argument("--stream-fps", type=float, default=15.0)
+    parser.add_argument("--metrics-port", type=int, help="serve metrics JSON on http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--metrics-file", help="rewrite a metrics JSON snapshot to this file every second")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from .comms import CommunicationManager
+
+    comms = CommunicationManager()
+    if args.serial:
+        ok, msg = comms.connect(args.serial, args.baudrate)
+        (log.info if ok else log.error)(msg)
+
+    if args.process:
+        from .worker import VisionProcess
+        vision = VisionProcess(model_path=args.model, backend=args.backend, calibration=args.calibration)
+    else:
+        from .vision import VisionSystem
+        vision = VisionSystem(args.model, backend=args.backend, calibration=args.calibration)
+
+    from .metrics import REGISTRY, MetricsExporter
+    comms.register_metrics(REGISTRY)
+    vision.register_metrics(REGISTRY)
+    if args.metrics_port or args.metrics_file:
+        MetricsExporter(REGISTRY, path=args.metrics_file, port=args.metrics_port).start()
+
+    service = StreamService(vision, comms, args.host, args.api_port, args.mjpeg_port, args.unix,
+                            args.jpeg_quality, args.stream_fps)
+    vision.start()
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vision.stop()
+        if args.process:
+            vision.close()
+        comms.disconnect()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import sys
+import time
+import cv2
+import numpy as np
+from .recording import FrameRecording
+
+# Frame sources share cv2.VideoCapture's read() / isOpened() / release()
+# interface, so the vision pipeline treats cameras and recordings alike.
+# read(image) may fill the given array instead of allocating; sources that
+# cannot (recordings) ignore it.
+
+def default_camera_backend():
+    """Native capture API of this platform: DirectShow (fast startup on Windows), V4L2, AVFoundation."""
+    if sys.platform == "win32":
+        return cv2.CAP_DSHOW
+    if sys.platform.startswith("linux"):
+        return cv2.CAP_V4L2
+    if sys.platform == "darwin":
+        return cv2.CAP_AVFOUNDATION
+    return cv2.CAP_ANY
+
+class CameraSource:
+    """
+    A physical camera. fourcc / width / height / fps are requested from the
+    driver (MJPG lets most USB cameras deliver 30 FPS above 640x480; YUYV
+    avoids decoding on the host); what the driver actually granted is in
+    negotiated(). buffer_size=1 keeps the driver queue at a single frame so
+    reads are never stale. convert_rgb=False returns the raw pixel format
+    (e.g. 16-bit radiometric thermal data) instead of BGR.
+    """
+    def __init__(self, index, width=640, height=480, backend=None, fourcc="MJPG", fps=None, buffer_size=1,
+                 convert_rgb=True):
+        self.cap = cv2.VideoCapture(index, default_camera_backend() if backend is None else backend)
+        # The pixel format has to be set before the size: V4L2 renegotiates the size on a format change
+        if fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        if width and height:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        if not convert_rgb:
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+    def negotiated(self):
+        """Format the driver settled on: {"fourcc", "width", "height", "fps"}."""
+        code = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        return {"fourcc": "".join(chr((code >> 8 * i) & 0xFF) for i in range(4)),
+                "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                "fps": self.cap.get(cv2.CAP_PROP_FPS)}
+
+    def read(self, image=None):
+        return self.cap.read(image)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+class FrameTransform:
+    """
+    Undistortion (optional calibration profile), horizontal mirroring and
+    resizing to out_size, written into a caller-provided array. With a
+    profile all three are one cv2.remap through tables built once per input
+    size. Without one, cv2.resize (into a reused scratch buffer) and
+    cv2.flip are used: their SIMD paths beat a generic remap even as two
+    passes, and the flip runs on the already reduced frame.
+    """
+    def __init__(self, mirror=True, out_size=None, calibration=None):
+        self.mirror = mirror
+        self.out_size = tuple(out_size) if out_size else None  # (width, height)
+        self.calibration = calibration if calibration is not None and calibration.camera_matrix is not None else None
+        self._size = None
+        self._maps = None
+        self._scratch = None
+
+    def output_shape(self, frame):
+        width, height = self.out_size or (frame.shape[1], frame.shape[0])
+        return (height, width) + frame.shape[2:]
+
+    def _build_maps(self, size):
+        map1, map2 = self.calibration.undistort_maps(size, self.out_size or size)
+        if self.mirror:
+            # Mirroring the destination layout of the tables mirrors the output
+            map1, map2 = np.ascontiguousarray(map1[:, ::-1]), np.ascontiguousarray(map2[:, ::-1])
+        return map1, map2
+
+    def apply(self, frame, dst):
+        size = (frame.shape[1], frame.shape[0])
+        if self.calibration is not None:
+            if size != self._size:
+                self._maps = self._build_maps(size)
+                self._size = size
+            return cv2.remap(frame, self._maps[0], self._maps[1], cv2.INTER_LINEAR, dst=dst)
+
+        if self.out_size is not None and self.out_size != size:
+            if not self.mirror:
+                return cv2.resize(frame, self.out_size, dst=dst)
+            if self._scratch is None or self._scratch.shape != dst.shape:
+                self._scratch = np.empty_like(dst)
+            frame = cv2.resize(frame, self.out_size, dst=self._scratch)
+        if self.mirror:
+            return cv2.flip(frame, 1, dst=dst)
+        np.copyto(dst, frame)
+        return dst
+
+class ReplaySource:
+    """
+    Plays back one source of a recording (see modules.recording).
+    realtime=True paces frames by their recorded timestamps, otherwise
+    they are delivered as fast as the consumer reads them.
+    Returned frames are read-only views into the memory-mapped chunks.
+    """
+    def __init__(self, directory, name, realtime=True, loop=False):
+        self.recording = FrameRecording(directory, name)
+        self.realtime = realtime
+        self.loop = loop
+        self.position = 0
+        self.exhausted = False
+        self._t0 = None
+        self._released = False
+
+    def read(self, image=None):
+        if self._released or len(self.recording) == 0:
+            return False, None
+        if self.position >= len(self.recording):
+            if not self.loop:
+                self.exhausted = True
+                return False, None
+            self.position = 0
+            self._t0 = None
+
+        times = self.recording.times
+        if self.realtime:
+            if self._t0 is None:
+                self._t0 = time.perf_counter() - (times[self.position] - times[0])
+            delay = self._t0 + (times[self.position] - times[0]) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = self.recording.frame(self.position)
+        self.position += 1
+        return True, frame
+
+    def isOpened(self):
+        return not self._released and len(self.recording) > 0
+
+    def release(self):
+        self._released = True
+
+class SyntheticSource:
+    """
+    Generated frames (noise plus a moving block) for headless benchmarks
+    when no recording is at hand. fps=None delivers frames unpaced.
+    """
+    def __init__(self, width=640, height=480, fps=None, count=None, seed=0):
+        rng = np.random.default_rng(seed)
+        self._base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self.width = width
+        self.height = height
+        self.interval = 1.0 / fps if fps else 0.0
+        self.count = count
+        self.position = 0
+        self.exhausted = False
+        self._next_time = None
+        self._released = False
+
+    def read(self, image=None):
+        if self._released:
+            return False, None
+        if self.count is not None and self.position >= self.count:
+            self.exhausted = True
+            return False, None
+        if self.interval:
+            now = time.perf_counter()
+            if self._next_time is None:
+                self._next_time = now
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += self.interval
+
+        frame = self._base.copy()
+        size = self.height // 4
+        x = (self.position * 8) % max(1, self.width - size)
+        frame[size:2 * size, x:x + size] = 255
+        self.position += 1
+        return True, frame
+
+    def isOpened(self):
+        return not self._released
+
+    def release(self):
+        self._released = True
+
+def open_source(spec, width=640, height=480, **options):
+    """
+    Camera index -> CameraSource; a dict is a per-camera format request,
+    e.g. {"index": 0, "width": 1280, "height": 720, "fps": 30, "fourcc": "MJPG"}.
+    Anything else is assumed to be a source already.
+    """
+    if isinstance(spec, int):
+        return CameraSource(spec, width, height, **options)
+    if isinstance(spec, dict):
+        spec = dict(spec)
+        index = spec.pop("index")
+        return CameraSource(index, **{"width": width, "height": height, **options, **spec})
+    return spec
@@ -0,0 +1,14 @@
+import importlib.util
+import os
+import sys
+
+# The repository root is the `modules` package (main.py imports modules.x);
+# register it under that name so the tests can use the same imports.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if "modules" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "modules", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["modules"] = module
+    spec.loader.exec_module(module)
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+from modules.backends import _ExportedBackend, calibration_frames, export_model
+from modules.recording import Recorder
+
+class EchoBackend(_ExportedBackend):
+    """Exported-model pre/post-processing around a fake network that reports one box at the input centre."""
+    def __init__(self):
+        super().__init__({"names": {"0": "person"}, "imgsz": 640}, conf=0.5)
+        self.shapes = []
+
+    def _run(self, blob):
+        self.shapes.append(blob.shape)
+        n, _, h, w = blob.shape
+        out = np.zeros((n, 5, 1), np.float32)
+        out[:, :, 0] = [w / 2, h / 2, 32, 64, 0.9]
+        return out
+
+def test_default_input_is_square_imgsz():
+    backend = EchoBackend()
+    (det,) = backend.predict([np.zeros((480, 640, 3), np.uint8)])
+    assert backend.shapes == [(1, 3, 640, 640)]
+    np.testing.assert_allclose(det.xyxy, [[304, 208, 336, 272]])
+
+def test_reduced_input_maps_boxes_back_to_the_crop():
+    backend = EchoBackend()
+    (det,) = backend.predict([np.zeros((240, 160, 3), np.uint8)], imgsz=(256, 160))
+    assert backend.shapes == [(1, 3, 256, 160)]
+    # 240x160 crop fits 256x160 unscaled with 8 rows of padding top and bottom
+    np.testing.assert_allclose(det.xyxy, [[64, 88, 96, 152]])
+
+def test_calibration_frames_from_a_recording(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    for i in range(10):
+        recorder.frames("rgb").write(np.full((8, 8, 3), i, np.uint8), i)
+    recorder.close()
+
+    frames = calibration_frames(str(tmp_path / "rgb"), count=4)
+    assert [int(f[0, 0, 0]) for f in frames] == [0, 3, 6, 9]
+    assert all(f.flags.writeable for f in frames)
+
+def test_calibration_frames_from_images(tmp_path):
+    for i in range(3):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), np.full((8, 8, 3), i * 50, np.uint8))
+    (tmp_path / "notes.txt").write_text("not an image")
+    assert [int(f[0, 0, 0]) for f in calibration_frames(str(tmp_path))] == [0, 50, 100]
+
+def test_int8_onnx_export_needs_calibration_frames(tmp_path, monkeypatch):
+    monkeypatch.delenv("SPIDERBOT_INT8_DATA", raising=False)
+    weights = tmp_path / "model.pt"
+    weights.write_bytes(b"weights")
+    with pytest.raises(ValueError, match="calibration"):
+        export_model(str(weights), "onnxruntime", int8=True, cache_dir=str(tmp_path / "cache"))
@@ -0,0 +1,40 @@
+import numpy as np
+from modules import bench, vision
+from modules.backends import Detections
+from modules.recording import Recorder
+
+class StubBackend:
+    """Stands in for a YOLO model: one fixed person box per frame."""
+    names = {0: "person", 1: "cup"}
+
+    def predict(self, frames, classes=None, imgsz=None):
+        return [Detections(np.array([[10, 10, 30, 40]], np.float32), np.array([0.9], np.float32),
+                           np.array([0], np.intp)) for _ in frames]
+
+def test_recording_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(vision, "load_backend", lambda *args, **kwargs: StubBackend())
+    recorder = Recorder(str(tmp_path), chunk_frames=8)
+    for i in range(20):
+        recorder.frames("rgb").write(np.full((96, 128, 3), i * 10, np.uint8), i / 30)
+    recorder.close()
+
+    config = {"model": "stub.pt", "backend": "ultralytics", "imgsz": 640, "threads": None, "int8": False,
+              "resolution": (64, 48), "frames": 15, "recording": str(tmp_path), "source_name": "rgb",
+              "realtime": False, "adaptive": False, "target_fps": None, "timeout": 10.0}
+    result = bench.run_config(config)
+
+    assert result["frames_published"] >= 15
+    assert result["fps"] > 0
+    assert "inference" in result["stages"]
+
+def test_int8_speedups_pair_runs_with_their_fp32_baseline():
+    def run(backend, int8, fps):
+        return {"model": "m.pt", "backend": backend, "resolution": "640x480", "int8": int8, "fps": fps,
+                "stages": {"inference": {"p50_ms": 1000.0 / fps}}}
+
+    runs = [run("onnxruntime", False, 10.0), run("onnxruntime", True, 15.0), run("openvino", True, 20.0),
+            {"model": "m.pt", "error": "benchmark process timed out"}]
+    (row,) = bench.int8_speedups(runs)
+    assert row["backend"] == "onnxruntime"
+    assert row["speedup"] == 1.5
+    assert row["inference_p50_ms_fp32"] == 100.0
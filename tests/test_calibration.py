@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from modules import calibration, vision
+from modules.backends import Detections
+from modules.calibration import CalibrationProfile, fit_class_widths, ultrasonic_samples
+from modules.comms import CommunicationManager
+from modules.protocol import encode_telemetry
+from modules.recording import Recorder, SerialRecording
+
+SCALE, OFFSET = 6000.0, 5.0  # ground truth of the synthetic recording: distance = SCALE / width + OFFSET
+
+class WidthBackend:
+    """One centred 'cup' whose width the test encodes in the frame's first pixel."""
+    names = {0: "person", 41: "cup"}
+    imgsz = 640
+
+    def predict(self, frames, classes=None, imgsz=None):
+        dets = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            half = float(frame[0, 0, 0]) * w / 640 / 2
+            box = np.array([[w / 2 - half, h / 2 - 20, w / 2 + half, h / 2 + 20]], np.float32)
+            dets.append(Detections(box, np.array([0.9], np.float32), np.array([41], np.intp)))
+        return dets
+
+def record_lab(directory, width=640, count=30):
+    recorder = Recorder(str(directory))
+    for i in range(count):
+        px = 40 + 5 * i
+        frame = np.zeros((width * 3 // 4, width, 3), np.uint8)
+        frame[0, 0, 0] = px
+        recorder.frames("rgb").write(frame, 100.0 + i)
+        recorder.serial.write(b"Dist: %.2f\n" % (SCALE / px + OFFSET), 100.0 + i + 0.01)
+    recorder.close()
+
+def test_fed_serial_recordings_decode_like_the_live_reader(tmp_path):
+    stream = b"".join(encode_telemetry(20 * i, [100 + i, 200, 300, 400]) for i in range(5))
+    recorder = Recorder(str(tmp_path))
+    for i in range(0, len(stream), 7):
+        recorder.serial.write(stream[i:i + 7], 50.0 + i / 1000)
+    recorder.close()
+
+    recording = SerialRecording(str(tmp_path))
+    comms = CommunicationManager()
+    for i in range(len(recording)):
+        t, data = recording.chunk(i)
+        comms.feed(data, t)
+    assert comms.protocol == "binary"
+    np.testing.assert_allclose(comms.get_channel("range0")[1], [10.0, 10.1, 10.2, 10.3, 10.4])
+
+def test_ultrasonic_samples_from_an_ascii_log(tmp_path):
+    record_lab(tmp_path, count=3)
+    times, distances = ultrasonic_samples(str(tmp_path))
+    np.testing.assert_allclose(distances, [155.0, 138.33, 125.0], atol=0.01)
+    assert np.all(np.diff(times) > 0)
+
+def test_fit_class_widths_recovers_the_distance_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(calibration, "load_backend", lambda *args, **kwargs: WidthBackend())
+    record_lab(tmp_path)
+    profile = fit_class_widths(CalibrationProfile(), str(tmp_path), stride=1)
+
+    assert profile.class_names == ["cup"]
+    assert profile.image_size == (640, 480)
+    np.testing.assert_allclose(profile.class_scale, [SCALE], rtol=1e-3)
+    np.testing.assert_allclose(profile.class_offset, [OFFSET], atol=0.05)
+
+    # A profile is tied to the frame width it was fitted at
+    other = tmp_path / "wide"
+    record_lab(other, width=1280)
+    with pytest.raises(ValueError):
+        fit_class_widths(profile, str(other), stride=1)
+
+def test_profile_round_trip_and_class_tables(tmp_path):
+    profile = CalibrationProfile(image_size=(640, 480), class_names=["cup"], class_scale=[SCALE],
+                                 class_offset=[OFFSET])
+    profile.save(str(tmp_path / "profile.npz"))
+    loaded = CalibrationProfile.load(str(tmp_path / "profile.npz"))
+    assert loaded.image_size == (640, 480) and loaded.camera_matrix is None
+
+    scale_table, offset_table = loaded.class_tables(WidthBackend.names)
+    assert scale_table[41] == SCALE and offset_table[41] == OFFSET
+    assert np.isnan(scale_table[0])
+
+def calibrated_distance(system, width):
+    frame = np.zeros((width * 3 // 4, width, 3), np.uint8)
+    frame[0, 0, 0] = 100
+    det = WidthBackend().predict([frame])[0]
+    return system._postprocess("rgb", det, width)[2]
+
+def calibrated_system(monkeypatch):
+    monkeypatch.setattr(vision, "load_backend", lambda *args, **kwargs: WidthBackend())
+    system = vision.VisionSystem(rgb_sources={"rgb": 0}, thermal_indexes=())
+    system.load_calibration(CalibrationProfile(image_size=(640, 480), class_names=["cup"],
+                                               class_scale=[SCALE], class_offset=[OFFSET]))
+    return system
+
+def test_calibrated_distances_ignore_the_focal_length(monkeypatch):
+    system = calibrated_system(monkeypatch)
+    system.set_focal_length(1234)
+    np.testing.assert_allclose(calibrated_distance(system, 640), [SCALE / 100 + OFFSET], rtol=1e-2)
+
+def test_calibrated_distances_follow_the_frame_width(monkeypatch):
+    # Fitted at 640 px: a 1280 px source sees the same object twice as wide
+    system = calibrated_system(monkeypatch)
+    np.testing.assert_allclose(calibrated_distance(system, 1280), calibrated_distance(system, 640))
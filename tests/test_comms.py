@@ -0,0 +1,88 @@
+import threading
+import time
+import pytest
+from modules import comms as comms_module
+from modules.comms import CommunicationManager
+
+class FakePort:
+    """Serial port whose first write blocks until `gate` is set, like a full output buffer."""
+    in_waiting = 0
+
+    def __init__(self):
+        self.written = []
+        self.gate = threading.Event()
+        self.writing = threading.Event()
+
+    def write(self, data):
+        self.writing.set()
+        self.gate.wait(5)
+        self.written.append(bytes(data))
+
+    def read(self, size=1):
+        time.sleep(0.01)
+        return b""
+
+    def close(self):
+        pass
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+@pytest.fixture
+def link(monkeypatch):
+    port = FakePort()
+    monkeypatch.setattr(comms_module.serial, "serial_for_url", lambda *args, **kwargs: port)
+    manager = CommunicationManager()
+    ok, msg = manager.connect("fake", protocol="ascii")
+    assert ok, msg
+    yield manager, port
+    port.gate.set()
+    manager.disconnect()
+
+def test_motion_commands_coalesce_while_the_writer_is_busy(link):
+    manager, port = link
+    manager.send_command("F")
+    assert port.writing.wait(5)
+    for cmd in "LRB":
+        manager.send_command(cmd)
+    assert manager.coalesced == 2
+
+    port.gate.set()
+    assert wait_for(lambda: len(port.written) == 2)
+    assert port.written == [b"F", b"B"]
+
+def test_stop_discards_queued_motion(link):
+    manager, port = link
+    manager.send_command("F")
+    assert port.writing.wait(5)
+    manager.send_command("L")
+    threading.Timer(0.1, port.gate.set).start()
+    assert manager.send_command("S")  # waits for the write in progress, then goes out directly
+
+    time.sleep(0.2)
+    assert port.written == [b"F", b"S"]
+
+def test_motion_dequeued_before_a_stop_is_never_written(link):
+    manager, port = link
+    port.gate.set()
+    # The writer thread took "F" off the queue, then a stop arrived before it wrote
+    generation = manager._stop_generation
+    manager.send_command("S")
+    assert not manager._write(port, 99, "F", generation)
+    assert port.written == [b"S"]
+
+def test_acknowledgements_measure_latency(link):
+    manager, port = link
+    port.gate.set()
+    manager.tag_commands = True
+    manager.send_command("F")
+    assert wait_for(lambda: port.written)
+    (sent,) = port.written
+    seq = sent.split(b":")[1].strip()
+
+    manager._handle_ascii(b"ACK:" + seq + b"\nACK:x\n")
+    assert manager.get_command_latency()["count"] == 1
+    assert manager.parse_errors == 1
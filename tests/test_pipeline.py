@@ -0,0 +1,71 @@
+import threading
+import time
+import numpy as np
+from modules.pipeline import FramePool, LatestSlot, StageStats
+
+def test_latest_slot_keeps_only_the_newest_item():
+    slot = LatestSlot()
+    slot.put(1)
+    slot.put(2)
+    slot.put(3)
+    assert slot.dropped == 2
+    assert slot.get_nowait() == 3
+    assert slot.get_nowait() is None
+
+def test_latest_slot_get_waits_for_a_put():
+    slot = LatestSlot()
+    threading.Timer(0.05, slot.put, args=("frame",)).start()
+    assert slot.get(timeout=2) == "frame"
+    assert slot.get(timeout=0.01) is None
+
+def test_latest_slot_close_wakes_a_waiting_consumer():
+    slot = LatestSlot()
+    threading.Timer(0.05, slot.close).start()
+    t0 = time.perf_counter()
+    assert slot.get(timeout=5) is None
+    assert time.perf_counter() - t0 < 1
+    slot.reset()
+    assert slot.get(timeout=0.01) is None
+
+def test_shared_ready_event_is_set_by_every_slot():
+    ready = threading.Event()
+    slots = [LatestSlot(ready), LatestSlot(ready)]
+    slots[1].put("b")
+    assert ready.is_set()
+    assert [s.get_nowait() for s in slots] == [None, "b"]
+
+def test_stage_stats_summary():
+    stats = StageStats(window=4)
+    for ms in (5, 1, 3, 2, 4):
+        stats.record("inference", ms / 1000)
+    summary = stats.summary()["inference"]
+    assert summary["count"] == 4  # the window keeps the last four samples
+    assert summary["last_ms"] == 4.0
+    assert summary["p50_ms"] == 3.0
+    assert summary["max_ms"] == 4.0
+    stats.clear()
+    assert stats.summary() == {}
+
+def test_latest_slot_replace_predicate_can_keep_the_pending_item():
+    slot = LatestSlot()
+    assert slot.put("detected")
+    assert not slot.put("tracked", replace=lambda pending: pending != "detected")
+    assert slot.dropped == 1
+    assert slot.get_nowait() == "detected"
+
+def test_latest_slot_hands_replaced_items_to_on_drop():
+    dropped = []
+    slot = LatestSlot(on_drop=dropped.append)
+    slot.put(1)
+    slot.put(2)
+    slot.put(3, replace=lambda pending: False)
+    assert dropped == [1, 3]
+
+def test_frame_pool_reuses_released_buffers():
+    pool = FramePool(max_free=1)
+    a = pool.acquire((4, 4, 3))
+    pool.release(a)
+    assert pool.acquire((4, 4, 3)) is a
+    assert pool.acquire((4, 4, 3)) is not a
+    assert pool.acquire((4, 4), np.uint16).dtype == np.uint16
+    assert pool.allocated == 3
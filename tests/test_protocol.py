@@ -0,0 +1,56 @@
+import numpy as np
+from modules.protocol import (BinaryDecoder, encode_frame, encode_telemetry, encode_command, decode_telemetry,
+                              decode_ranges, looks_binary, MSG_TELEMETRY, MSG_RANGES, MSG_COMMAND)
+from modules.comms import CommunicationManager, detect_protocol, DETECT_BYTES
+
+def test_telemetry_round_trip_in_small_chunks():
+    stream = encode_telemetry(1000, [100, 200, 300, 400], battery_mv=7400) + \
+        encode_telemetry(1020, [110, 210, 310, 410], battery_mv=7390)
+    decoder = BinaryDecoder()
+    payloads = []
+    for i in range(0, len(stream), 3):
+        payloads += decoder.feed(stream[i:i + 3]).get(MSG_TELEMETRY, [])
+
+    records = decode_telemetry(payloads)
+    assert len(records) == 2
+    np.testing.assert_array_equal(records['range_mm'][1], [110, 210, 310, 410])
+    assert records['battery_mv'].tolist() == [7400, 7390]
+    assert decoder.crc_errors == 0
+
+def test_corrupted_frame_is_dropped_and_decoder_resyncs():
+    good = encode_frame(MSG_RANGES, np.array([500, 600], '<u2').tobytes())
+    bad = bytearray(good)
+    bad[-3] ^= 0xFF
+    decoder = BinaryDecoder()
+    messages = decoder.feed(b'noise' + bytes(bad) + good)
+
+    assert decoder.crc_errors >= 1
+    assert len(messages[MSG_RANGES]) == 1
+    assert decode_ranges(messages[MSG_RANGES][0]).tolist() == [50.0, 60.0]
+
+def test_command_frame():
+    messages = BinaryDecoder().feed(encode_command(7, "F"))
+    (payload,) = messages[MSG_COMMAND]
+    assert int.from_bytes(payload[:2], 'little') == 7
+    assert payload[2:] == b"F"
+
+def test_protocol_detection():
+    frame = encode_telemetry(0, [1, 2, 3, 4])
+    assert looks_binary(frame)
+    assert not looks_binary(frame[:-1])
+    assert detect_protocol(frame) == "binary"
+    assert detect_protocol(frame[:5]) is None
+    assert detect_protocol(b"Dist: 45\n") == "ascii"
+    assert detect_protocol(b"Dist: 4") is None
+    assert detect_protocol(b"\x00" * DETECT_BYTES) == "ascii"
+
+def test_telemetry_frames_fill_the_sensor_channels():
+    comms = CommunicationManager()
+    comms.protocol = "binary"
+    frame = encode_telemetry(0, [1234, 500, 0, 65535], accel_mg=(0, 0, 1000), gyro_cdps=(-150, 0, 0),
+                             battery_mv=7400)
+    comms._handle_binary(frame, now=5.0)
+    assert [comms.get_latest(f"range{i}")[1] for i in range(4)] == [123.4, 50.0, 0.0, 6553.5]
+    assert comms.get_latest("accel_z") == (5.0, 1.0)
+    assert comms.get_latest("gyro_x")[1] == -1.5
+    assert comms.get_latest("battery_v")[1] == 7.4
@@ -0,0 +1,80 @@
+import time
+import numpy as np
+from modules.recording import Recorder, FrameRecording, SerialRecording, SerialReplayer
+from modules.sources import ReplaySource
+from modules.comms import CommunicationManager
+
+def test_frame_round_trip(tmp_path):
+    recorder = Recorder(str(tmp_path), chunk_frames=4)
+    frames = [np.full((6, 8, 3), i, np.uint8) for i in range(10)]
+    for i, frame in enumerate(frames):
+        recorder.frames("cam").write(frame, 100.0 + i / 30)
+    recorder.close()
+
+    recording = FrameRecording(str(tmp_path), "cam")
+    assert len(recording) == 10
+    np.testing.assert_allclose(recording.times, 100.0 + np.arange(10) / 30)
+
+    source = ReplaySource(str(tmp_path), "cam", realtime=False)
+    replayed = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        replayed.append(frame.copy())
+    assert source.exhausted
+    assert len(replayed) == len(frames)
+    for a, b in zip(replayed, frames):
+        np.testing.assert_array_equal(a, b)
+
+def test_raw_thermal_frames_keep_their_dtype(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    frame = np.arange(12, dtype=np.uint16).reshape(3, 4) * 1000
+    recorder.frames("thermal").write(frame, 1.0)
+    recorder.close()
+
+    replayed = FrameRecording(str(tmp_path), "thermal").frame(0)
+    assert replayed.dtype == np.uint16
+    np.testing.assert_array_equal(replayed, frame)
+
+def test_looping_replay_restarts(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    for i in range(3):
+        recorder.frames("cam").write(np.full((2, 2, 3), i, np.uint8), i)
+    recorder.close()
+
+    source = ReplaySource(str(tmp_path), "cam", realtime=False, loop=True)
+    values = [int(source.read()[1][0, 0, 0]) for _ in range(7)]
+    assert values == [0, 1, 2, 0, 1, 2, 0]
+
+def test_serial_round_trip(tmp_path):
+    chunks = [(10.0, b"Dist: 4"), (10.1, b"5\nDist: 46\n"), (10.25, b"47\n")]
+    recorder = Recorder(str(tmp_path))
+    for t, data in chunks:
+        recorder.serial.write(data, t)
+    recorder.close()
+
+    recording = SerialRecording(str(tmp_path))
+    assert [recording.chunk(i) for i in range(len(recording))] == chunks
+
+def test_serial_replay_into_a_connected_manager(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    for i, data in enumerate([b"Dist: 4", b"5\nDist: 46\n", b"47\n"]):
+        recorder.serial.write(data, i * 0.01)
+    recorder.close()
+
+    replayer = SerialReplayer(str(tmp_path), realtime=False)
+    comms = CommunicationManager()
+    ok, msg = comms.connect(replayer.port)
+    assert ok, msg
+    try:
+        replayer.start()
+        assert replayer.finished.wait(5)
+        deadline = time.time() + 5
+        while len(comms.get_samples()[1]) < 3 and time.time() < deadline:
+            time.sleep(0.02)
+        assert comms.get_samples()[1].tolist() == [45.0, 46.0, 47.0]
+        assert comms.protocol == "ascii"
+    finally:
+        comms.disconnect()
+        replayer.stop()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import numpy as np
+from modules import vision
+from modules.backends import Detections
+from modules.service import CLIENT_QUEUE_SIZE, StreamService, _Client
+from modules.sources import SyntheticSource
+
+class StubVision:
+    def __init__(self):
+        self.channels = {"rgb": None}
+        self.names = {0: "person"}
+        self.settings = []
+
+    def set_focal_length(self, value):
+        self.settings.append(("focal_length", value))
+
+class StubComms:
+    def __init__(self):
+        self.commands = []
+
+    def send_command(self, cmd):
+        self.commands.append(cmd)
+
+    def get_channel(self, name, since=None):
+        return np.zeros(0), np.zeros(0)
+
+class StubBackend:
+    names = {0: "person"}
+
+    def predict(self, frames, classes=None, imgsz=None):
+        return [Detections(np.array([[10, 10, 30, 40]], np.float32), np.array([0.9], np.float32),
+                           np.array([0], np.intp)) for _ in frames]
+
+def api_session(service, lines, replies):
+    """Send `lines` to the API of `service` and return the first `replies` messages after hello."""
+    async def session():
+        server = await asyncio.start_server(service._serve_api, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            hello = json.loads(await asyncio.wait_for(reader.readline(), 5))
+            assert hello["type"] == "hello" and hello["sources"] == ["rgb"]
+            for line in lines:
+                writer.write(line + b"\n")
+            await writer.drain()
+            return [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(replies)]
+        finally:
+            writer.close()
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(session())
+
+def test_messages_are_routed():
+    vision, comms = StubVision(), StubComms()
+    service = StreamService(vision, comms)
+    replies = api_session(service, [b'{"type": "command", "cmd": "F"}',
+                                    b'{"type": "set", "name": "focal_length", "value": 700}',
+                                    b'{"type": "bogus"}'], 1)
+    assert comms.commands == ["F"]
+    assert vision.settings == [("focal_length", 700)]
+    assert replies[0]["type"] == "error"
+
+def test_malformed_messages_get_an_error_and_keep_the_connection():
+    comms = StubComms()
+    service = StreamService(StubVision(), comms)
+    replies = api_session(service, [b'[1, 2]', b'"x"', b'3', b'{not json',
+                                    b'{"type": "command", "cmd": "S"}', b'{"type": "bogus"}'], 5)
+    assert [r["type"] for r in replies] == ["error"] * 5
+    # The connection survived: the command between the bad lines still arrived
+    assert comms.commands == ["S"]
+
+def test_subscriptions_filter_topics_and_slow_clients_drop_the_oldest():
+    service = StreamService(StubVision(), StubComms())
+
+    async def run():
+        client = _Client(None)
+        service._handle_message(client, {"type": "subscribe", "topics": ["samples", "unknown"]})
+        assert client.topics == {"samples"}
+        client.offer("detections", b"d\n")
+        for i in range(CLIENT_QUEUE_SIZE + 2):
+            client.offer("samples", b"%d\n" % i)
+        return client
+
+    client = asyncio.run(run())
+    assert client.dropped == 2
+    assert client.outbox.get_nowait() == b"2\n"
+
+def test_in_process_vision_pushes_every_frame(monkeypatch):
+    monkeypatch.setattr(vision, "load_backend", lambda *args, **kwargs: StubBackend())
+    system = vision.VisionSystem(rgb_sources={"rgb": SyntheticSource(64, 48, fps=60)}, thermal_indexes=())
+    service = StreamService(system, StubComms(), api_port=0, mjpeg_port=0)
+
+    async def run():
+        serving = asyncio.ensure_future(service.serve())
+        await asyncio.sleep(0.1)
+        assert system.on_detections == service._on_detections
+        client = _Client(None)
+        service.clients.add(client)
+        system.start()
+        try:
+            await asyncio.sleep(0.5)
+        finally:
+            system.stop()
+            await asyncio.get_running_loop().run_in_executor(None, system.join)
+        await asyncio.sleep(0.05)
+        serving.cancel()
+        return client
+
+    client = asyncio.run(run())
+    annotated = system.get_stage_latency()["postprocess:rgb"]["count"]
+    assert annotated > 5
+    assert client.outbox.qsize() + client.dropped == annotated
+    assert system.on_detections is None
@@ -0,0 +1,23 @@
+import numpy as np
+from modules.sources import FrameTransform, SyntheticSource, open_source
+
+def test_transform_mirrors_and_resizes_into_the_given_buffer():
+    frame = np.zeros((4, 8, 3), np.uint8)
+    frame[:, :4] = 255  # left half white
+    transform = FrameTransform(mirror=True, out_size=(4, 2))
+    dst = np.empty(transform.output_shape(frame), np.uint8)
+    assert transform.apply(frame, dst) is dst
+    assert dst.shape == (2, 4, 3)
+    assert dst[:, :2].max() == 0 and dst[:, 2:].min() == 255
+
+def test_transform_without_resize_only_mirrors():
+    frame = np.arange(6, dtype=np.uint8).reshape(1, 2, 3)
+    transform = FrameTransform(mirror=True)
+    out = transform.apply(frame, np.empty_like(frame))
+    np.testing.assert_array_equal(out, frame[:, ::-1])
+
+def test_synthetic_source_counts_frames():
+    source = open_source(SyntheticSource(16, 12, count=2))
+    assert source.read()[1].shape == (12, 16, 3)
+    assert source.read()[0]
+    assert source.read() == (False, None) and source.exhausted
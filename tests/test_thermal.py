@@ -0,0 +1,30 @@
+import numpy as np
+from modules.thermal import HOTSPOT_FIELDS, ThermalProcessor, find_hotspots, thermal_values
+
+def test_find_hotspots():
+    values = np.zeros((40, 60), np.float32)
+    values[5:10, 5:10] = 50.0
+    values[20:30, 40:50] = 80.0
+    values[0, 59] = 90.0  # below min_area
+    spots = find_hotspots(values, threshold=10.0)
+    assert spots.shape == (2, len(HOTSPOT_FIELDS))
+    np.testing.assert_array_equal(spots[0, :4], [40, 20, 50, 30])
+    assert spots[0, 4] == 80.0 and spots[0, 6] == 100
+    assert spots[1, 4] == 50.0
+
+def test_radiometric_frames_become_temperatures():
+    raw = np.full((2, 2), 30000, np.uint16)  # centikelvin
+    np.testing.assert_allclose(thermal_values(raw), 26.85, atol=1e-3)
+
+def test_raw_frames_are_rendered_with_their_hotspots():
+    raw = np.full((30, 40), 29315, np.uint16)  # 20 C
+    raw[10:15, 10:15] = 31315                   # 40 C
+    display, spots, values = ThermalProcessor(display_size=(80, 60)).process(raw)
+    assert display.shape == (60, 80, 3)
+    assert len(spots) == 1 and abs(spots[0, 4] - 40.0) < 1e-3
+    assert values.shape == raw.shape
+
+def test_false_colour_frames_have_no_hotspots():
+    display, spots, values = ThermalProcessor(display_size=(40, 30)).process(np.zeros((60, 80, 3), np.uint8))
+    assert display.shape == (30, 40, 3)
+    assert len(spots) == 0 and values is None
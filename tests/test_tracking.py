@@ -0,0 +1,66 @@
+import numpy as np
+from modules.backends import Detections
+from modules.tracking import AdaptiveScheduler, IoUTracker, iou_matrix
+
+def detections(boxes, cls):
+    return Detections(np.array(boxes, np.float32), np.full(len(boxes), 0.9, np.float32), np.array(cls, np.intp))
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 1 / 3, 0.0]], rtol=1e-5)
+
+def test_ids_follow_moving_boxes():
+    tracker = IoUTracker()
+    _, first = tracker.update(detections([[0, 0, 50, 100], [200, 0, 250, 100]], [0, 0]))
+    assert len(set(first.tolist())) == 2
+
+    # Same objects, moved a little and reported in the opposite order
+    _, ids = tracker.update(detections([[204, 2, 254, 102], [3, 1, 53, 101]], [0, 0]))
+    assert ids.tolist() == [first[1], first[0]]
+
+def test_new_object_and_class_mismatch_get_new_ids():
+    tracker = IoUTracker()
+    _, first = tracker.update(detections([[0, 0, 50, 100]], [0]))
+    _, ids = tracker.update(detections([[0, 0, 50, 100], [300, 300, 350, 350]], [41, 0]))
+    assert first[0] not in ids.tolist()
+    assert len(set(ids.tolist())) == 2
+
+def test_tracks_coast_then_expire():
+    tracker = IoUTracker(max_misses=2)
+    _, first = tracker.update(detections([[0, 0, 50, 100]], [0]))
+    for _ in range(2):
+        _, ids = tracker.predict()
+        assert ids.tolist() == first.tolist()
+    _, ids = tracker.predict()
+    assert len(ids) == 0
+
+def test_distances_are_smoothed_per_track():
+    tracker = IoUTracker(smoothing=0.5)
+    _, ids = tracker.update(detections([[0, 0, 50, 100]], [0]))
+    assert tracker.smooth_distances(ids, np.array([100.0])).tolist() == [100.0]
+    _, ids = tracker.update(detections([[0, 0, 50, 100]], [0]))
+    assert tracker.smooth_distances(ids, np.array([200.0])).tolist() == [150.0]
+    # An unknown distance keeps the estimate
+    assert tracker.smooth_distances(ids, np.array([np.nan])).tolist() == [150.0]
+
+def test_scheduler_runs_the_detector_every_interval_frames():
+    scheduler = AdaptiveScheduler(interval=3)
+    frame = np.zeros((48, 64, 3), np.uint8)
+    assert [scheduler.should_detect(frame) for _ in range(7)] == [True, False, False, True, False, False, True]
+
+def test_scheduler_detects_early_on_scene_change():
+    scheduler = AdaptiveScheduler(interval=10)
+    dark, bright = np.zeros((48, 64, 3), np.uint8), np.full((48, 64, 3), 200, np.uint8)
+    assert scheduler.should_detect(dark)
+    assert not scheduler.should_detect(dark)
+    assert scheduler.should_detect(bright)
+
+def test_scheduler_interval_follows_the_target_fps():
+    scheduler = AdaptiveScheduler(interval=3, target_fps=20)
+    scheduler._window_start -= 1.0
+    scheduler.adjust(10.0)
+    assert scheduler.interval == 4
+    scheduler._window_start -= 1.0
+    scheduler.adjust(30.0)
+    assert scheduler.interval == 3
@@ -0,0 +1,78 @@
+import time
+import numpy as np
+from modules import vision
+from modules.backends import Detections
+from modules.sources import SyntheticSource
+
+class CenterBackend:
+    """Finds one 40x80 person in the middle of every input and records the input sizes it was asked for."""
+    names = {0: "person", 1: "cup"}
+    imgsz = 640
+
+    def __init__(self):
+        self.sizes = []
+
+    def predict(self, frames, classes=None, imgsz=None):
+        self.sizes.append(imgsz)
+        dets = []
+        for frame in frames:
+            h, w = frame.shape[:2]
+            box = np.array([[w / 2 - 20, h / 2 - 40, w / 2 + 20, h / 2 + 40]], np.float32)
+            dets.append(Detections(box, np.array([0.9], np.float32), np.array([0], np.intp)))
+        return dets
+
+def make_system(monkeypatch, backend, **options):
+    monkeypatch.setattr(vision, "load_backend", lambda *args, **kwargs: backend)
+    return vision.VisionSystem(rgb_sources={"rgb": SyntheticSource(640, 480, fps=60)}, thermal_indexes=(), **options)
+
+def run(system, seconds=0.5):
+    system.start()
+    time.sleep(seconds)
+    system.stop()
+    system.join()
+
+def test_sources_share_one_batched_model(monkeypatch):
+    backend = CenterBackend()
+    monkeypatch.setattr(vision, "load_backend", lambda *args, **kwargs: backend)
+    batch_sizes = []
+    predict = backend.predict
+
+    def slow_predict(frames, **kwargs):
+        # Both cameras deliver a frame while the model is busy
+        batch_sizes.append(len(frames))
+        time.sleep(0.05)
+        return predict(frames, **kwargs)
+
+    backend.predict = slow_predict
+    sources = {"front": SyntheticSource(64, 48, fps=60), "rear": SyntheticSource(32, 24, fps=60)}
+    system = vision.VisionSystem(rgb_sources=sources, thermal_indexes=())
+    run(system)
+
+    assert max(batch_sizes) == 2
+    for name, shape in (("front", (48, 64, 3)), ("rear", (24, 32, 3))):
+        seq, frame = system.channels[name].acquire()
+        assert seq > 0 and frame.shape == shape
+        system.channels[name].release(frame)
+
+def test_roi_input_size_follows_the_crop(monkeypatch):
+    system = make_system(monkeypatch, CenterBackend())
+    assert system._roi_input_size((240, 160, 3), (480, 640, 3)) == (256, 160)
+    # Full-HD frames are downscaled to imgsz, so crops are downscaled alike
+    assert system._roi_input_size((240, 160, 3), (1080, 1920, 3)) == (96, 64)
+    assert system._roi_input_size((480, 640, 3), (480, 640, 3)) == (480, 640)
+
+def test_roi_crops_run_at_a_smaller_input(monkeypatch):
+    backend = CenterBackend()
+    system = make_system(monkeypatch, backend, focus="target", roi=True)
+    run(system)
+
+    assert backend.sizes[0] is None  # no target yet: full frame at imgsz
+    assert (256, 160) in backend.sizes
+    _, _, rows = system.get_detections("rgb")
+    np.testing.assert_array_equal(rows[0, :4], [300, 200, 340, 280])
+
+def test_without_roi_frames_use_the_full_input(monkeypatch):
+    backend = CenterBackend()
+    system = make_system(monkeypatch, backend, focus="target")
+    run(system, 0.2)
+    assert backend.sizes and set(backend.sizes) == {None}
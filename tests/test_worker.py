@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+import numpy as np
+import pytest
+from modules.worker import SharedRing, VisionProcess
+
+class FakeWorker:
+    """Stands in for the spawned worker process; the test plays its part through `status`."""
+    def __init__(self, target, name, daemon, args):
+        self.settings = args[3]
+        self.status = args[5]
+        self.alive = False
+        self.exitcode = None
+
+    def start(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.alive = False
+
+    def heartbeat(self, progress):
+        self.status.put(({"rgb": 30.0}, {}, {0: "person"}, progress))
+
+class FakeContext:
+    def __init__(self):
+        self.workers = []
+
+    def Queue(self):
+        return queue.Queue()
+
+    def Event(self):
+        return threading.Event()
+
+    def Process(self, **kwargs):
+        self.workers.append(FakeWorker(**kwargs))
+        return self.workers[-1]
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+@pytest.fixture
+def process():
+    vp = VisionProcess(max_frame_shape=(8, 8, 3), heartbeat_timeout=0.6, startup_timeout=0.6, restart_delay=0.01)
+    vp._ctx = FakeContext()
+    yield vp
+    vp.close()
+
+def test_shared_ring_round_trip():
+    ring = SharedRing((4, 3), np.float64, slots=2)
+    reader = SharedRing.attach(ring.spec())
+    try:
+        assert reader.read() is None
+        assert ring.write(np.ones((2, 3)), t=1.5)
+        seq, t, rows = reader.read()
+        assert (seq, t) == (1, 1.5) and rows.shape == (2, 3)
+        assert reader.read(seq) is None and not reader.has_new(seq)
+        assert not ring.write(np.ones((5, 3)))  # larger than the slots
+    finally:
+        reader.close()
+        ring.close()
+
+def test_crashed_worker_is_restarted_with_its_settings(process):
+    process.set_target_class("cup")
+    process.start()
+    first = process._ctx.workers[0]
+    first.heartbeat((1,))
+    assert wait_for(lambda: process.names)
+    process.set_focal_length(700)
+
+    first.alive = False
+    assert wait_for(lambda: len(process._ctx.workers) == 2)
+    assert process.restarts == 1
+    assert process._ctx.workers[1].settings == {"set_target_class": ("cup",), "set_focal_length": (700.0,)}
+
+def test_worker_that_never_reports_in_is_restarted(process):
+    process.start()
+    assert wait_for(lambda: len(process._ctx.workers) == 2)
+    assert not process._ctx.workers[0].alive
+
+def test_worker_without_heartbeats_is_restarted(process):
+    process.start()
+    process._ctx.workers[0].heartbeat((0,))
+    time.sleep(0.3)
+    assert len(process._ctx.workers) == 1
+    assert wait_for(lambda: len(process._ctx.workers) == 2)
+
+def test_stalled_pipeline_is_restarted_but_an_idle_one_is_not(process):
+    process.start()
+    worker = process._ctx.workers[0]
+    # Heartbeats keep coming but no frame was ever published (camera not open): not a hang
+    for _ in range(6):
+        worker.heartbeat((0,))
+        time.sleep(0.2)
+    assert len(process._ctx.workers) == 1
+
+    # Frames flowed, then the published frame number stopped moving
+    worker.heartbeat((5,))
+    for _ in range(6):
+        worker.heartbeat((5,))
+        time.sleep(0.2)
+    assert len(process._ctx.workers) == 2
+
+def test_rejected_setting_is_forgotten(process):
+    process.start()
+    process.set_target_class("banana")
+    process._ctx.workers[0].status.put(("error", "set_target_class", ("banana",), "ValueError: unknown"))
+    assert wait_for(lambda: process.last_error is not None)
+    assert process.last_error == ("set_target_class", "ValueError: unknown")
+    assert "set_target_class" not in process._settings
+
+def test_invalid_focus_is_rejected_before_it_is_stored(process):
+    with pytest.raises(ValueError):
+        process.set_focus("everything")
+    assert process._settings == {}
@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+
+# --- THERMAL ---
+# Raw thermal frames (CameraSource(convert_rgb=False)) keep the sensor's
+# values instead of a false-colour picture: 16-bit radiometric cameras
+# (e.g. FLIR Lepton in TLinear mode, centikelvin) give temperatures, 8-bit
+# ones a relative intensity. Hotspots are extracted from those values and
+# the display image is rendered from them afterwards.
+
+HOTSPOT_FIELDS = ("x1", "y1", "x2", "y2", "peak", "mean", "area")
+
+def thermal_values(raw, scale=0.01, offset=-273.15):
+    """
+    Per-pixel values of a raw thermal frame as a 2-D array: degrees C for
+    16-bit radiometric data (value * scale + offset), intensity 0..255 for
+    8-bit frames (YUYV luma or BGR converted to gray).
+    """
+    if raw.dtype == np.uint16:
+        return raw.astype(np.float32) * scale + offset
+    if raw.ndim == 3 and raw.shape[2] == 2:
+        return raw[:, :, 0]
+    if raw.ndim == 3:
+        return cv2.cvtColor(raw, cv2.COLOR_BGR2GRAY)
+    return raw
+
+def find_hotspots(values, threshold=None, min_area=4, max_spots=8):
+    """
+    Connected regions hotter than threshold (default: mean + 3 std of the
+    frame), as an (N, 7) float array with HOTSPOT_FIELDS columns, hottest
+    first. One labelling pass plus per-label reductions, no Python loop
+    over pixels or regions.
+    """
+    if threshold is None:
+        threshold = float(values.mean() + 3.0 * values.std())
+    mask = (values > threshold).view(np.uint8)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1:
+        return np.zeros((0, len(HOTSPOT_FIELDS)), np.float32)
+
+    hot = labels.ravel()
+    pixels = values.ravel().astype(np.float32)
+    inside = hot > 0
+    peak = np.full(n, -np.inf, np.float32)
+    np.maximum.at(peak, hot[inside], pixels[inside])
+    total = np.bincount(hot[inside], weights=pixels[inside], minlength=n)
+
+    x, y, w, h, area = stats[1:].T
+    rows = np.column_stack([x, y, x + w, y + h, peak[1:], total[1:] / area, area]).astype(np.float32)
+    rows = rows[area >= min_area]
+    return rows[np.argsort(-rows[:, 4])[:max_spots]]
+
+class ThermalProcessor:
+    """
+    Turns raw thermal frames into (display image, hotspots). Display
+    buffers are preallocated: the raw-size colour map is rendered once and
+    resized straight into the output array.
+    """
+    def __init__(self, display_size=(400, 300), threshold=None, min_area=4, scale=0.01, offset=-273.15,
+                 colormap=cv2.COLORMAP_INFERNO):
+        self.display_size = display_size
+        self.threshold = threshold
+        self.min_area = min_area
+        self.scale = scale
+        self.offset = offset
+        self.colormap = colormap
+        self.display = np.zeros((display_size[1], display_size[0], 3), np.uint8)
+        self._gray = None
+        self._color = None
+        self._no_hotspots = np.zeros((0, len(HOTSPOT_FIELDS)), np.float32)
+
+    def process(self, raw):
+        """
+        Returns (display BGR image, hotspots, values). A false-colour
+        picture (camera with built-in colouring, the default capture mode)
+        is only resized: its brightness does not follow temperature, so it
+        gets no hotspots (empty rows) and values is None.
+        """
+        if raw.ndim == 3 and raw.shape[2] == 3 and raw.dtype == np.uint8:
+            cv2.resize(raw, self.display_size, dst=self.display)
+            return self.display, self._no_hotspots, None
+
+        values = thermal_values(raw, self.scale, self.offset)
+        if self._gray is None or self._gray.shape != values.shape:
+            self._gray = np.empty(values.shape, np.uint8)
+            self._color = np.empty(values.shape + (3,), np.uint8)
+        cv2.normalize(values, self._gray, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        cv2.applyColorMap(self._gray, self.colormap, dst=self._color)
+        cv2.resize(self._color, self.display_size, dst=self.display)
+
+        hotspots = find_hotspots(values, self.threshold, self.min_area)
+        if len(hotspots):
+            sx = self.display_size[0] / values.shape[1]
+            sy = self.display_size[1] / values.shape[0]
+            for x1, y1, x2, y2, peak, _, _ in hotspots.tolist():
+                cv2.rectangle(self.display, (int(x1 * sx), int(y1 * sy)), (int(x2 * sx), int(y2 * sy)),
+                              (255, 255, 255), 1)
+                cv2.putText(self.display, f"{peak:.1f}", (int(x1 * sx), max(12, int(y1 * sy) - 4)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
+        return self.display, hotspots, values
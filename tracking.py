@@ -0,0 +1,195 @@
+import time
+import cv2
+import numpy as np
+from .backends import Detections
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+class IoUTracker:
+    """
+    Greedy IoU tracker with a constant-velocity (alpha-beta) box model.
+    Every frame advances the tracks by their velocity. update() then
+    associates a fresh detector result with the predicted boxes;
+    predict() alone is used when the detector was skipped.
+    Track state is kept in parallel NumPy arrays.
+    """
+    def __init__(self, iou_threshold=0.3, max_misses=15, smoothing=0.3, velocity_gain=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses   # frames a track survives without a detection
+        self.smoothing = smoothing     # EMA weight of a new distance sample
+        self.velocity_gain = velocity_gain
+        self._next_id = 1
+        self.ids = np.zeros(0, np.int64)
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.velocity = np.zeros((0, 4), np.float32)  # box change per frame
+        self.cls = np.zeros(0, np.intp)
+        self.conf = np.zeros(0, np.float32)
+        self.misses = np.zeros(0, np.int32)     # frames since last detection
+        self.distance = np.zeros(0, np.float64)  # smoothed distance, NaN if unknown
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _output(self, rows=None):
+        rows = np.arange(len(self.ids)) if rows is None else rows
+        return Detections(self.boxes[rows].copy(), self.conf[rows].copy(), self.cls[rows].copy()), self.ids[rows].copy()
+
+    def predict(self):
+        """Advance every track by its velocity; returns (Detections, track ids)."""
+        self.boxes += self.velocity
+        self.misses += 1
+        self._prune()
+        return self._output()
+
+    def update(self, det):
+        """Associate a detector result; returns (Detections, track ids) in det order."""
+        self.boxes += self.velocity
+        self.misses += 1
+
+        n = len(det)
+        det_ids = np.zeros(n, np.int64)
+        matched_track = np.full(n, -1, np.intp)
+
+        iou = iou_matrix(det.xyxy, self.boxes)
+        if iou.size:
+            # Only boxes of the same class may match
+            iou[det.cls[:, None] != self.cls[None, :]] = 0.0
+            # Greedy assignment, best overlaps first
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                d, t = divmod(int(flat), iou.shape[1])
+                if iou[d, t] < self.iou_threshold:
+                    break
+                if matched_track[d] >= 0 or t in matched_track:
+                    continue
+                matched_track[d] = t
+
+        hit = matched_track >= 0
+        t_idx = matched_track[hit]
+        if len(t_idx):
+            # Correct the velocity by the prediction error spread over the frames since the last detection
+            gap = self.misses[t_idx][:, None].astype(np.float32)
+            new_boxes = det.xyxy[hit].astype(np.float32)
+            self.velocity[t_idx] += self.velocity_gain * (new_boxes - self.boxes[t_idx]) / gap
+            self.boxes[t_idx] = new_boxes
+            self.conf[t_idx] = det.conf[hit]
+            self.misses[t_idx] = 0
+            det_ids[hit] = self.ids[t_idx]
+
+        # Unmatched tracks coast on their prediction; unmatched detections start new tracks
+        new = ~hit
+        k = int(new.sum())
+        if k:
+            new_ids = np.arange(self._next_id, self._next_id + k)
+            self._next_id += k
+            det_ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, det.xyxy[new].astype(np.float32)])
+            self.velocity = np.concatenate([self.velocity, np.zeros((k, 4), np.float32)])
+            self.cls = np.concatenate([self.cls, det.cls[new]])
+            self.conf = np.concatenate([self.conf, det.conf[new].astype(np.float32)])
+            self.misses = np.concatenate([self.misses, np.zeros(k, np.int32)])
+            self.distance = np.concatenate([self.distance, np.full(k, np.nan)])
+
+        self._prune()
+        return Detections(det.xyxy, det.conf, det.cls), det_ids
+
+    def _prune(self):
+        keep = self.misses <= self.max_misses
+        if keep.all():
+            return
+        self.ids, self.boxes, self.velocity = self.ids[keep], self.boxes[keep], self.velocity[keep]
+        self.cls, self.conf, self.misses = self.cls[keep], self.conf[keep], self.misses[keep]
+        self.distance = self.distance[keep]
+
+    def smooth_distances(self, ids, distances):
+        """Blend per-frame distances into each track's running estimate and return the smoothed values."""
+        if len(ids) == 0 or len(self.ids) == 0:
+            return distances
+        rows = np.searchsorted(self.ids, ids)
+        rows = np.clip(rows, 0, len(self.ids) - 1)
+        valid = self.ids[rows] == ids
+        prev = self.distance[rows]
+        fresh = np.isnan(prev) | ~valid
+        out = np.where(fresh, distances, prev + self.smoothing * (distances - prev))
+        # NaN samples (unknown width) leave the estimate untouched
+        out = np.where(np.isnan(distances), prev, out)
+        self.distance[rows[valid]] = out[valid]
+        return out
+
+class MotionDetector:
+    """Mean absolute difference (0-255) of a small grayscale thumbnail against a reference frame."""
+    def __init__(self, size=(80, 60)):
+        self.size = size
+        self._reference = None
+        self._thumb = np.empty(size[::-1], np.uint8)
+
+    def score(self, frame):
+        gray = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        self._thumb = gray
+        if self._reference is None:
+            return float("inf")
+        return float(cv2.absdiff(gray, self._reference).mean())
+
+    def set_reference(self):
+        """The last scored frame becomes the reference (call when the detector ran on it)."""
+        self._reference = self._thumb
+
+class AdaptiveScheduler:
+    """
+    Decides per frame whether the detector runs. It runs every `interval`
+    frames, or sooner when the scene changed by more than motion_threshold.
+    With target_fps and/or cpu_budget (fraction of wall time spent in the
+    detector) the interval adapts once a second between min and max.
+    """
+    def __init__(self, interval=3, min_interval=1, max_interval=15, motion_threshold=12.0,
+                 target_fps=None, cpu_budget=None):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.target_fps = target_fps
+        self.cpu_budget = cpu_budget
+        self.motion = MotionDetector()
+        self._since_detect = None
+        self._busy = 0.0
+        self._window_start = time.perf_counter()
+
+    def should_detect(self, frame):
+        motion = self.motion.score(frame)
+        if self._since_detect is None or self._since_detect + 1 >= self.interval or motion > self.motion_threshold:
+            self._since_detect = 0
+            self.motion.set_reference()
+            return True
+        self._since_detect += 1
+        return False
+
+    def record_inference(self, seconds):
+        self._busy += seconds
+
+    def adjust(self, fps):
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < 1.0:
+            return
+        duty = self._busy / elapsed
+        self._busy = 0.0
+        self._window_start = now
+
+        too_slow = (self.target_fps and fps < 0.95 * self.target_fps) or (self.cpu_budget and duty > self.cpu_budget)
+        headroom = (not self.target_fps or fps > 1.1 * self.target_fps) and \
+                   (not self.cpu_budget or duty < 0.8 * self.cpu_budget)
+        if too_slow:
+            self.interval = min(self.max_interval, self.interval + 1)
+        elif headroom and (self.target_fps or self.cpu_budget):
+            self.interval = max(self.min_interval, self.interval - 1)
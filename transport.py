@@ -0,0 +1,144 @@
+import threading
+import queue
+import cv2
+import numpy as np
+
+class FrameChannel:
+    """
+    Latest-frame handoff from a producer thread to the GUI.
+    Frames are written into a small pool of preallocated RGB buffers
+    (one being written, one published, one being read), so steady-state
+    publishing allocates nothing. Every publish bumps a sequence number;
+    consumers pass the last one they saw and get None when nothing changed.
+    """
+    def __init__(self, pool_size=3):
+        self._lock = threading.Lock()
+        self._pool = [None] * max(3, pool_size)
+        self._published = -1   # pool index of the latest frame
+        self._readers = [0] * len(self._pool)  # consumers holding each pool index
+        self.seq = 0
+
+    def _free_index(self, shape):
+        with self._lock:
+            busy = [n > 0 for n in self._readers]
+            if self._published >= 0:
+                busy[self._published] = True
+        for i in range(len(self._pool)):
+            if not busy[i]:
+                buf = self._pool[i]
+                if buf is None or buf.shape != shape:
+                    self._pool[i] = np.empty(shape, np.uint8)
+                return i
+        return None
+
+    def publish_bgr(self, frame):
+        """Color-convert a BGR frame straight into a pooled buffer and publish it."""
+        i = self._free_index(frame.shape)
+        if i is None:
+            return False
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._pool[i])
+        self._commit(i)
+        return True
+
+    def publish_rgb(self, frame):
+        i = self._free_index(frame.shape)
+        if i is None:
+            return False
+        np.copyto(self._pool[i], frame)
+        self._commit(i)
+        return True
+
+    def _commit(self, i):
+        with self._lock:
+            self._published = i
+            self.seq += 1
+
+    def has_new(self, last_seq):
+        """True if acquire(last_seq) would return a frame."""
+        return self._published >= 0 and self.seq != last_seq
+
+    def acquire(self, last_seq=0):
+        """Return (seq, rgb_buffer) for a newer frame than last_seq, else None. Must be released."""
+        with self._lock:
+            if not self.has_new(last_seq):
+                return None
+            i = self._published
+            self._readers[i] += 1
+            return self.seq, self._pool[i]
+
+    def release(self, buf):
+        with self._lock:
+            for i, b in enumerate(self._pool):
+                if b is buf:
+                    self._readers[i] = max(0, self._readers[i] - 1)
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._published = -1
+            self.seq += 1
+
+class ChannelQueue:
+    """
+    queue.Queue-like view over a FrameChannel: get_nowait() returns each new
+    frame once, as a PIL image, and raises queue.Empty otherwise.
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self._last_seq = 0
+
+    def empty(self):
+        return not self.channel.has_new(self._last_seq)
+
+    def get_nowait(self):
+        from PIL import Image
+
+        got = self.channel.acquire(self._last_seq)
+        if got is None:
+            raise queue.Empty
+        seq, buf = got
+        try:
+            img = Image.fromarray(buf.copy())
+        finally:
+            self.channel.release(buf)
+        self._last_seq = seq
+        return img
+
+class FrameView:
+    """
+    Shows a FrameChannel in a Tk Label through one persistent PhotoImage
+    that is updated in place. Frames already shown are skipped.
+    """
+    def __init__(self, label):
+        from PIL import ImageTk
+
+        self._ImageTk = ImageTk
+        self.label = label
+        self.photo = None
+        self.last_seq = 0
+
+    def update(self, channel):
+        from PIL import Image
+
+        got = channel.acquire(self.last_seq)
+        if got is None:
+            return False
+        seq, buf = got
+        try:
+            h, w = buf.shape[:2]
+            # Wrap the pooled buffer without copying it
+            img = Image.frombuffer("RGB", (w, h), buf, "raw", "RGB", 0, 1)
+            if self.photo is None or self.photo.width() != w or self.photo.height() != h:
+                self.photo = self._ImageTk.PhotoImage("RGB", (w, h))
+                self.label.configure(image=self.photo)
+                self.label.imgtk = self.photo
+            self.photo.paste(img)
+        finally:
+            channel.release(buf)
+        self.last_seq = seq
+        return True
+
+    def clear(self):
+        self.photo = None
+        self.label.imgtk = None
+        self.label.config(image='')
@@ -1,4 +1,8 @@
 import math
+import time
+import logging
+import threading
+import numpy as np
 
 # --- CONFIGURATION ---
 # Known width of objects in centimeters (Real World)
@@ -18,6 +22,15 @@ KNOWN_WIDTHS = {
 # Default Focal Length (Pixel units) - Needs Calibration!
 DEFAULT_FOCAL_LENGTH = 600.0 
 
+# Distance bands (cm) and their BGR colors: far/unknown, near, too close
+BAND_FAR, BAND_NEAR, BAND_CLOSE = 0, 1, 2
+BAND_LIMITS = (30.0, 60.0)
+BAND_COLORS = (
+    (0, 255, 0),    # Green
+    (0, 165, 255),  # Orange
+    (0, 0, 255),    # Red
+)
+
 def calculate_distance(pixel_width, real_width, focal_length):
     """
     Calculate distance from the camera to the object.
@@ -26,3 +39,178 @@ def calculate_distance(pixel_width, real_width, focal_length):
     if pixel_width == 0: 
         return 0
     return (real_width * focal_length) / pixel_width
+
+def build_width_table(class_names, known_widths=KNOWN_WIDTHS):
+    """
+    Real-world widths indexed by model class id.
+    class_names is the model's {id: name} mapping; classes without a known
+    width are NaN.
+    """
+    table = np.full(max(class_names) + 1, np.nan, dtype=np.float64)
+    for cls, name in class_names.items():
+        if name in known_widths:
+            table[cls] = known_widths[name]
+    return table
+
+def calculate_distances(xyxy, cls, width_table, focal_length):
+    """
+    Batch version of calculate_distance for a whole set of detections.
+    xyxy is an (N, 4) box array and cls an (N,) class id array.
+    Returns an (N,) float array; NaN where the class width is unknown and
+    0 where the box has no width.
+    """
+    pixel_widths = xyxy[:, 2] - xyxy[:, 0]
+    real_widths = width_table[cls]
+    distances = np.zeros(len(pixel_widths), dtype=np.float64)
+    np.divide(real_widths * focal_length, pixel_widths, out=distances, where=pixel_widths != 0)
+    distances[np.isnan(real_widths)] = np.nan
+    return distances
+
+def calculate_bearings(xyxy, frame_width, focal_length, mirrored=True):
+    """
+    Horizontal bearing (radians, positive to the robot's right) of each box
+    centre for a pinhole camera facing forward. mirrored: the frame was
+    flipped horizontally, as VisionSystem does for display.
+    """
+    offsets = (xyxy[:, 0] + xyxy[:, 2]) / 2.0 - frame_width / 2.0
+    if mirrored:
+        offsets = -offsets
+    return np.arctan2(offsets, focal_length)
+
+def distance_bands(distances):
+    """Color band per distance (BAND_FAR for unknown distances)."""
+    bands = np.full(len(distances), BAND_FAR, dtype=np.int8)
+    known = ~np.isnan(distances)
+    bands[known & (distances < BAND_LIMITS[1])] = BAND_NEAR
+    bands[known & (distances < BAND_LIMITS[0])] = BAND_CLOSE
+    return bands
+
+class RingBuffer:
+    """
+    Fixed-capacity NumPy ring buffer.
+    Every value is written twice (at i and i + capacity), so the last
+    `capacity` values are always one contiguous slice: view() costs no copy.
+    """
+    def __init__(self, capacity, dtype=np.float64, fill=0):
+        self.capacity = capacity
+        self._data = np.full(2 * capacity, fill, dtype=dtype)
+        self._head = 0  # index of the oldest value
+        self.count = 0  # total values ever appended
+
+    def append(self, value):
+        i = self._head
+        self._data[i] = value
+        self._data[i + self.capacity] = value
+        self._head = (i + 1) % self.capacity
+        self.count += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        if len(values) >= self.capacity:
+            self.count += len(values)
+            values = values[-self.capacity:]
+            self._data[:self.capacity] = values
+            self._data[self.capacity:] = values
+            self._head = 0
+            return
+        for value in values:
+            self.append(value)
+
+    def view(self):
+        """Oldest-to-newest values; a read-only view into the buffer."""
+        out = self._data[self._head:self._head + self.capacity]
+        out.flags.writeable = False
+        return out
+
+    def last(self):
+        return self._data[self._head + self.capacity - 1]
+
+class SampleBuffer:
+    """
+    Bounded history of timestamped readings (time.time() seconds).
+    Old samples are overwritten once capacity is reached.
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0  # write index
+        self.count = 0  # total samples ever appended
+
+    def append(self, t, value):
+        i = self._next
+        self._times[i] = t
+        self._values[i] = value
+        self._next = (i + 1) % self.capacity
+        self.count += 1
+
+    def extend(self, times, values):
+        """Append arrays of samples in one vectorized write."""
+        n = len(values)
+        if n >= self.capacity:
+            self._times[:] = times[-self.capacity:]
+            self._values[:] = values[-self.capacity:]
+            self._next = 0
+            self.count += n
+            return
+        idx = (np.arange(self._next, self._next + n)) % self.capacity
+        self._times[idx] = times
+        self._values[idx] = values
+        self._next = (self._next + n) % self.capacity
+        self.count += n
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def latest(self):
+        """(t, value) of the newest sample, or None."""
+        if self.count == 0:
+            return None
+        i = self._next - 1
+        return self._times[i], self._values[i]
+
+    def since(self, t=None):
+        """(times, values) arrays of samples newer than t, oldest first (copies)."""
+        n = len(self)
+        order = (np.arange(self._next - n, self._next)) % self.capacity
+        times = self._times[order]
+        values = self._values[order]
+        if t is not None:
+            start = np.searchsorted(times, t, side='right')
+            times, values = times[start:], values[start:]
+        return times, values
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets through at most `burst` records per message template every
+    `interval` seconds; the next record that passes reports how many were
+    suppressed in the meantime.
+    """
+    def __init__(self, interval=5.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._windows = {}  # template -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(record.msg)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                window = self._windows[record.msg] = [now, 0, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+def get_logger(name):
+    """Module logger with rate limiting, so hot paths can log without flooding."""
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter())
+    return logger
@@ -1,149 +1,594 @@
 import cv2
 import threading
-import queue
 import time
 import numpy as np
-from PIL import Image
-from ultralytics import YOLO
-from .utils import KNOWN_WIDTHS, calculate_distance
+from .calibration import load_profile
+from .utils import BAND_COLORS, build_width_table, calculate_distances, calculate_bearings, distance_bands, get_logger
+from .pipeline import FramePacket, FramePool, LatestSlot, StageStats, FpsCounter, elapsed_since
+from .transport import FrameChannel, ChannelQueue
+from .sources import FrameTransform, open_source
+from .backends import STRIDE, Detections, load_backend
+from .tracking import IoUTracker, AdaptiveScheduler
+from .thermal import ThermalProcessor
+
+log = get_logger(__name__)
+
+# Default camera layout: one RGB camera at index 0, thermal at index 1 or 2.
+# Any entry may also be a frame source object (see modules.sources).
+DEFAULT_RGB_SOURCES = {"rgb": 0}
+DEFAULT_THERMAL_INDEXES = (1, 2)
+
+# Focused inference modes (VisionSystem.set_focus):
+#   None     - every class the model knows
+#   "known"  - only classes with a width in utils.KNOWN_WIDTHS (distance capable)
+#   "target" - only the current target class
+FOCUS_MODES = (None, "known", "target")
+ROI_MIN_SIZE = 160  # smallest ROI side in pixels, so a small target keeps some context
+
+# Flat per-detection rows, as handed to other processes and consumers
+# (bearing in radians, positive to the robot's right; distance NaN if unknown)
+MAX_DETECTIONS = 128
+DETECTION_FIELDS = ("x1", "y1", "x2", "y2", "cls", "distance", "band", "target", "track_id", "bearing")
+
+def pack_detections(detections, out=None):
+    """Flatten VisionSystem post-processing output into DETECTION_FIELDS rows (at most MAX_DETECTIONS)."""
+    xyxy, cls, distances, bands, known, is_target, ids, bearings = detections
+    n = min(len(cls), MAX_DETECTIONS)
+    rows = np.empty((n, len(DETECTION_FIELDS)), np.float64) if out is None else out[:n]
+    rows[:, 0:4] = xyxy[:n]
+    rows[:, 4] = cls[:n]
+    rows[:, 5] = distances[:n]
+    rows[:, 6] = bands[:n]
+    rows[:, 7] = is_target[:n]
+    rows[:, 8] = ids[:n]
+    rows[:, 9] = bearings[:n]
+    return rows
 
 class VisionSystem:
-    def __init__(self, model_path="yolov8m.pt"):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path="yolov8m.pt", rgb_sources=None, thermal_indexes=DEFAULT_THERMAL_INDEXES,
+                 backend="ultralytics", imgsz=640, threads=None, int8=False, conf=0.5, int8_data=None,
+                 track=False, adaptive=False, target_fps=None, cpu_budget=None,
+                 focus=None, roi=False, roi_margin=1.0, calibration=None, frame_size=None, thermal_raw=False):
+        # One model shared by every RGB source, fed one batch per tick.
+        # backend / imgsz / threads / int8 trade accuracy for FPS (see modules.backends);
+        # int8_data: calibration frames for an INT8 ONNX export.
+        # track: give detections stable IDs and smoothed distances (modules.tracking).
+        # adaptive: run the detector only every N frames or on scene change and
+        # propagate tracks in between; N adapts to target_fps / cpu_budget.
+        # focus / roi / roi_margin: see set_focus().
+        # calibration: CalibrationProfile or .npz path (see modules.calibration).
+        # rgb_sources values may be format requests ({"index", "width", "height",
+        # "fps", "fourcc"}, see sources.open_source); frame_size=(w, h) resizes
+        # every RGB source together with the mirror / undistortion.
+        # thermal_raw: read raw radiometric thermal frames (modules.thermal).
+        self.backend = load_backend(model_path, backend, imgsz=imgsz, threads=threads, int8=int8, conf=conf,
+                                    int8_data=int8_data)
+        self._width_table = build_width_table(self.backend.names)
+        self._scale_table = None   # calibrated classes: distance = scale / width_px + offset
+        self._offset_table = None
         self.running = False
-        
-        # RGB Camera
-        self.cap = None
-        self.frame_queue = queue.Queue(maxsize=1)
-        
+
+        # RGB Cameras (name -> capture index or frame source)
+        self.rgb_sources = dict(rgb_sources or DEFAULT_RGB_SOURCES)
+        self.caps = {}
+
+        # Optional modules.recording.Recorder; raw frames are logged at capture
+        self.recorder = None
+
+        # Optional callback(name, packet) after post-processing; packet.detections is set
+        self.on_detections = None
+        self._latest_detections = dict.fromkeys(self.rgb_sources)
+
+        # Per-source output channels, read by the GUI
+        self.channels = {name: FrameChannel() for name in self.rgb_sources}
+        self.channels["thermal"] = FrameChannel()
+        self.queues = {name: ChannelQueue(channel) for name, channel in self.channels.items()}
+
+        # RGB Pipeline: capture (per source) -> batched inference -> annotate (per source)
+        self._frame_ready = threading.Event()
+        # Captured frames live in pooled buffers, returned after publishing or when dropped
+        self.frame_size = tuple(frame_size) if frame_size else None
+        self._frame_pool = FramePool()
+        self._transforms = {}
+        recycle = lambda packet: self._frame_pool.release(packet.frame)
+        self._capture_slots = {name: LatestSlot(self._frame_ready, recycle) for name in self.rgb_sources}
+        self._result_slots = {name: LatestSlot(on_drop=recycle) for name in self.rgb_sources}
+        self._fps = {name: FpsCounter() for name in self.rgb_sources}
+        self.stats = StageStats()
+        self.last_batch_size = 0
+        self._threads = []
+
+        # Tracking / adaptive detector scheduling (per source)
+        self._trackers = {name: IoUTracker() for name in self.rgb_sources} if (track or adaptive) else {}
+        self._schedulers = {
+            name: AdaptiveScheduler(target_fps=target_fps, cpu_budget=cpu_budget) for name in self.rgb_sources
+        } if adaptive else {}
+        self.frames_detected = dict.fromkeys(self.rgb_sources, 0)
+        self.frames_tracked = dict.fromkeys(self.rgb_sources, 0)
+
         # Thermal Camera
+        self.thermal_indexes = tuple(thermal_indexes)
+        self.thermal_raw = thermal_raw
+        self.thermal = ThermalProcessor()
         self.cap_thermal = None
-        self.thermal_queue = queue.Queue(maxsize=1)
-        
+        self._latest_hotspots = None  # (time, rows) from the last thermal frame
+
         # Settings
         self.focal_length = 600.0
+        self.calibration = None
         self.target_class = "person"
-        self.fps = 0
-        self.frame_count = 0
-        self.start_time = time.time()
+        self._target_id = self._class_id(self.target_class)
+
+        # Focused inference: class filter and ROI around the last target box
+        self.focus = None
+        self.roi = False
+        self.roi_margin = roi_margin
+        self._classes = None
+        self._roi_boxes = dict.fromkeys(self.rgb_sources)  # name -> (x1, y1, x2, y2) or None, replaced whole
+        self.frames_cropped = dict.fromkeys(self.rgb_sources, 0)
+        self.set_focus(focus, roi)
+        if calibration is not None:
+            self.load_calibration(calibration)
+
+    # The first RGB source and the thermal stream keep their historical names
+    @property
+    def frame_channel(self):
+        return self.channels[next(iter(self.rgb_sources))]
+
+    @property
+    def thermal_channel(self):
+        return self.channels["thermal"]
+
+    @property
+    def frame_queue(self):
+        return self.queues[next(iter(self.rgb_sources))]
+
+    @property
+    def thermal_queue(self):
+        return self.queues["thermal"]
+
+    @property
+    def fps(self):
+        return self._fps[next(iter(self.rgb_sources))].fps
+
+    def get_channel(self, source):
+        return self.channels[source]
+
+    def get_detections(self, source, last_seq=0):
+        """(seq, time.time(), DETECTION_FIELDS rows) of the newest frame if newer than last_seq, else None."""
+        latest = self._latest_detections[source]
+        if latest is None or latest[0] == last_seq:
+            return None
+        seq, t, detections = latest
+        return seq, t, pack_detections(detections)
+
+    def get_hotspots(self):
+        """(time.time(), thermal.HOTSPOT_FIELDS rows) of the last thermal frame, or None."""
+        return self._latest_hotspots
+
+    def register_metrics(self, registry, prefix="vision"):
+        """Expose pipeline state as callback metrics (modules.metrics); read only when a snapshot is taken."""
+        def stage(key):
+            return lambda: {k: v for k, v in self.stats.summary().get(key, {}).items()
+                            if k in ("p50_ms", "p95_ms", "max_ms")}
+
+        registry.gauge(f"{prefix}.inference_ms", stage("inference"))
+        registry.gauge(f"{prefix}.batch_size", lambda: self.last_batch_size)
+        registry.gauge(f"{prefix}.frame_buffers", lambda: self._frame_pool.allocated)
+        registry.gauge(f"{prefix}.thermal.hotspots",
+                       lambda: 0 if self._latest_hotspots is None else len(self._latest_hotspots[1]))
+        for name in self.rgb_sources:
+            registry.gauge(f"{prefix}.{name}.fps", lambda n=name: self._fps[n].fps)
+            registry.gauge(f"{prefix}.{name}.end_to_end_ms", stage(f"end_to_end:{name}"))
+            registry.counter(f"{prefix}.{name}.published", lambda n=name: self.channels[n].seq)
+            registry.counter(f"{prefix}.{name}.dropped",
+                             lambda n=name: self._capture_slots[n].dropped + self._result_slots[n].dropped)
+
+    def warm_up(self, shape=(480, 640, 3)):
+        """One dummy inference, so lazy runtime initialisation is not paid by the first camera frame."""
+        t0 = time.perf_counter()
+        self.backend.predict([np.zeros(shape, np.uint8)])
+        return time.perf_counter() - t0
+
+    def get_queue(self, source):
+        return self.queues[source]
 
     def start(self):
         if not self.running:
             self.running = True
-            threading.Thread(target=self._process_rgb, daemon=True).start()
-            threading.Thread(target=self._process_thermal, daemon=True).start()
+            self._frame_ready.clear()
+            for slot in list(self._capture_slots.values()) + list(self._result_slots.values()):
+                slot.reset()
+            for counter in self._fps.values():
+                counter.reset()
+            for name in self._trackers:
+                self._trackers[name] = IoUTracker()
+            self._latest_detections = dict.fromkeys(self.rgb_sources)
+            self._latest_hotspots = None
+            for channel in self.channels.values():
+                channel.clear()
+            self.stats.clear()
+
+            self._threads = [threading.Thread(target=self._infer_rgb, daemon=True)]
+            for name in self.rgb_sources:
+                self._threads.append(threading.Thread(target=self._capture_rgb, args=(name,), daemon=True))
+                self._threads.append(threading.Thread(target=self._annotate_rgb, args=(name,), daemon=True))
+            self._threads.append(threading.Thread(target=self._process_thermal, daemon=True))
+            for t in self._threads:
+                t.start()
 
     def stop(self):
         self.running = False
-        if self.cap:
-            self.cap.release()
+        self._frame_ready.set()
+        for slot in list(self._capture_slots.values()) + list(self._result_slots.values()):
+            slot.close()
+        for cap in self.caps.values():
+            cap.release()
         if self.cap_thermal:
             self.cap_thermal.release()
 
+    def join(self, timeout=1.0):
+        """Wait for the pipeline threads to exit after stop()."""
+        for t in self._threads:
+            t.join(timeout)
+
     def set_focal_length(self, fl):
+        """Focal length of the KNOWN_WIDTHS model; calibrated classes do not depend on it."""
         self.focal_length = float(fl)
 
+    def _frame_scale(self, frame_width):
+        """Frame width relative to the calibration's image_size (1 without one)."""
+        profile = self.calibration
+        if profile is None or profile.image_size is None:
+            return 1.0
+        return frame_width / profile.image_size[0]
+
+    def load_calibration(self, calibration):
+        """
+        Use a calibration profile (or .npz path; None to drop it): frames are
+        undistorted at capture and distances use the fitted per-class model.
+        """
+        profile = load_profile(calibration)
+        self._scale_table = self._offset_table = None
+        if profile is not None:
+            if profile.camera_matrix is not None:
+                self.focal_length = profile.focal_length  # at image_size, see _frame_scale()
+            if profile.class_names:
+                self._scale_table, self._offset_table = profile.class_tables(self.backend.names)
+        self.calibration = profile
+        self._transforms = {}  # rebuilt by the capture threads
+        self.set_focus(self.focus)  # "known" depends on the distance tables
+
     def set_target_class(self, target):
         self.target_class = target
+        self._target_id = self._class_id(target)
+        self.set_focus(self.focus)
+
+    def set_focus(self, focus, roi=None):
+        """
+        Restrict inference to the classes of `focus` (see FOCUS_MODES).
+        roi=True additionally crops inference to the area around the last
+        target box, expanded by roi_margin box sizes on each side; the
+        full frame is used again as soon as the target is lost.
+        """
+        if focus not in FOCUS_MODES:
+            raise ValueError(f"unknown focus {focus!r}, expected one of {FOCUS_MODES}")
+        if focus == "known":
+            known = ~np.isnan(self._width_table)
+            if self._scale_table is not None:
+                known |= ~np.isnan(self._scale_table)
+            classes = np.flatnonzero(known).tolist()
+        elif focus == "target":
+            classes = [self._target_id] if self._target_id >= 0 else []
+        else:
+            classes = None
+        self.focus = focus
+        self._classes = classes
+        if roi is not None:
+            self.roi = bool(roi)
+        for name in self._roi_boxes:
+            self._roi_boxes[name] = None
+
+    def _class_id(self, label):
+        for cls, name in self.backend.names.items():
+            if name == label:
+                return cls
+        return -1
+
+    def get_stage_latency(self):
+        """Per-stage latency summary in milliseconds, plus frames dropped between stages."""
+        summary = self.stats.summary()
+        summary["dropped"] = {
+            name: {
+                "before_inference": self._capture_slots[name].dropped,
+                "before_annotate": self._result_slots[name].dropped,
+            }
+            for name in self.rgb_sources
+        }
+        if self.roi:
+            summary["roi"] = {name: None if box is None else [int(v) for v in box]
+                              for name, box in self._roi_boxes.items()}
+            summary["frames_cropped"] = dict(self.frames_cropped)
+        if self._schedulers:
+            summary["detector_interval"] = {name: s.interval for name, s in self._schedulers.items()}
+            summary["frames_detected"] = dict(self.frames_detected)
+            summary["frames_tracked"] = dict(self.frames_tracked)
+        return summary
 
-    def _process_rgb(self):
-        # Use CAP_DSHOW for faster startup on Windows
-        self.cap = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
-        self.start_time = time.time()
-        self.frame_count = 0
+    def _capture_rgb(self, name):
+        cap = open_source(self.rgb_sources[name])
+        self.caps[name] = cap
+        slot = self._capture_slots[name]
 
+        if hasattr(cap, "negotiated") and cap.isOpened():
+            log.info("camera %s: %s", name, cap.negotiated())
+
+        seq = 0
+        raw = None
         while self.running:
-            ret, frame = self.cap.read()
+            t0 = time.perf_counter()
+            # The driver decodes into the previous raw buffer when it can
+            ret, frame = cap.read(raw)
             if not ret:
                 time.sleep(0.1)
                 continue
-            
-            # Flip frame horizontally
-            frame = cv2.flip(frame, 1)
-
-            # AI Inference
-            results = self.model(frame, stream=True, verbose=False, conf=0.5)
-            
-            for r in results:
-                for box in r.boxes:
-                    cls = int(box.cls[0])
-                    label = self.model.names[cls]
-                    
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    w_pixel = x2 - x1
-                    
-                    color = (0, 255, 0) # Green
-                    dist_text = ""
-
-                    if label in KNOWN_WIDTHS:
-                        real_width = KNOWN_WIDTHS[label]
-                        distance = calculate_distance(w_pixel, real_width, self.focal_length)
-                        dist_text = f"{distance:.0f}cm"
-                        
-                        if distance < 30:
-                            color = (0, 0, 255) # Red
-                        elif distance < 60:
-                            color = (0, 165, 255) # Orange
-                        
-                        if label == self.target_class:
-                            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 3) # Cyan thick box
-                    
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    full_label = f"{label} {dist_text}"
-                    cv2.putText(frame, full_label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            if frame.flags.writeable:
+                raw = frame
+
+            recorder = self.recorder
+            if recorder is not None:
+                recorder.frames(name).write(frame)
+            t1 = time.perf_counter()
+            self.stats.record(f"capture:{name}", t1 - t0)
+
+            # Undistort (calibrated cameras), flip horizontally and resize into
+            # a pooled buffer, see FrameTransform (stage keeps its historical name)
+            transform = self._transforms.get(name)
+            if transform is None:
+                transform = self._transforms[name] = FrameTransform(True, self.frame_size, self.calibration)
+            frame = transform.apply(frame, self._frame_pool.acquire(transform.output_shape(frame)))
+            self.stats.record(f"flip:{name}", elapsed_since(t1))
+
+            # Reading continuously keeps the driver buffer drained; the
+            # inference stage only ever sees the newest frame.
+            seq += 1
+            packet = FramePacket(seq, frame, t0)
+            packet.queued_at = time.perf_counter()
+            slot.put(packet)
+
+        cap.release()
+
+    def _infer_rgb(self):
+        names = list(self.rgb_sources)
+        while self.running:
+            if not self._frame_ready.wait(0.1):
+                continue
+            self._frame_ready.clear()
+
+            # Collect the freshest frame from every source that has one
+            batch = []
+            for name in names:
+                packet = self._capture_slots[name].get_nowait()
+                if packet is not None:
+                    batch.append((name, packet))
+            if not batch or not self.running:
+                continue
+
+            t0 = time.perf_counter()
+            for name, packet in batch:
+                self.stats.record(f"handoff_infer:{name}", t0 - packet.queued_at)
+
+            # Adaptive mode: frames the scheduler skips bypass the detector,
+            # their boxes come from the tracker in the annotate stage
+            if self._schedulers:
+                detect = []
+                for name, packet in batch:
+                    scheduler = self._schedulers[name]
+                    scheduler.adjust(self._fps[name].fps)
+                    if scheduler.should_detect(packet.frame):
+                        detect.append((name, packet))
+                    else:
+                        # A pending detector result must reach the tracker: never replace it
+                        # with a tracker-only frame
+                        packet.queued_at = time.perf_counter()
+                        if self._result_slots[name].put(packet, replace=lambda pending: pending.results is None):
+                            self.frames_tracked[name] += 1
+                batch = detect
+                if not batch:
+                    continue
+                t0 = time.perf_counter()
+
+            # Crop to the target ROI where one is known; crops run at a smaller
+            # model input, so frames are grouped by input size
+            inputs, offsets, groups = [], [], {}
+            for i, (name, packet) in enumerate(batch):
+                crop, offset = self._crop_roi(name, packet.frame)
+                inputs.append(crop)
+                offsets.append(offset)
+                size = None
+                if offset is not None:
+                    size = self._roi_input_size(crop.shape, packet.frame.shape)
+                    self.frames_cropped[name] += 1
+                groups.setdefault(size, []).append(i)
+
+            # AI Inference: one forward pass per input size
+            results = [Detections.empty() for _ in inputs]
+            if self._classes != []:
+                for size, members in groups.items():
+                    dets = self.backend.predict([inputs[i] for i in members], classes=self._classes, imgsz=size)
+                    for i, det in zip(members, dets):
+                        results[i] = det
+            t1 = time.perf_counter()
+            self.stats.record("inference", t1 - t0)
+            self.last_batch_size = len(batch)
+
+            # Route each result back to the source it came from
+            for (name, packet), det, offset in zip(batch, results, offsets):
+                if offset is not None:
+                    det.xyxy = det.xyxy + np.asarray(offset + offset, dtype=det.xyxy.dtype)
+                self.frames_detected[name] += 1
+                if name in self._schedulers:
+                    self._schedulers[name].record_inference((t1 - t0) / len(batch))
+                packet.results = det
+                packet.queued_at = t1
+                self._result_slots[name].put(packet)
+
+    def _crop_roi(self, name, frame):
+        """Returns the inference input for `frame` and its (x, y) offset, or None when uncropped."""
+        box = self._roi_boxes[name] if self.roi else None
+        if box is None:
+            return frame, None
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = box
+        mx = max((x2 - x1) * self.roi_margin, (ROI_MIN_SIZE - (x2 - x1)) / 2)
+        my = max((y2 - y1) * self.roi_margin, (ROI_MIN_SIZE - (y2 - y1)) / 2)
+        x1, y1 = max(0, int(x1 - mx)), max(0, int(y1 - my))
+        x2, y2 = min(w, int(x2 + mx)), min(h, int(y2 + my))
+        if x2 - x1 < 2 or y2 - y1 < 2 or (x2 - x1) * (y2 - y1) > 0.8 * w * h:
+            return frame, None
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def _roi_input_size(self, crop_shape, frame_shape):
+        """
+        Model input (h, w) for a crop: the crop at the pixel scale a full
+        frame gets at imgsz, rounded up to STRIDE. Objects keep their size
+        in the model input while the input shrinks with the crop.
+        """
+        imgsz = self.backend.imgsz
+        r = imgsz / max(frame_shape[:2])
+        h, w = (min(imgsz, STRIDE * max(1, int(np.ceil(side * r / STRIDE)))) for side in crop_shape[:2])
+        return h, w
+
+    def _update_roi(self, name, xyxy, is_target):
+        if not self.roi:
+            return
+        if is_target.any():
+            # Follow the largest target box
+            boxes = xyxy[is_target]
+            areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            # Published as one immutable tuple: the infer thread reads it without a lock
+            self._roi_boxes[name] = tuple(int(v) for v in boxes[areas.argmax()])
+        else:
+            self._roi_boxes[name] = None
+
+    def _postprocess(self, name, det, frame_width):
+        """
+        Distances, color bands, target flags and bearings for a whole Detections set at once.
+        det is None for frames the adaptive scheduler kept away from the detector.
+        """
+        tracker = self._trackers.get(name)
+        if tracker is None:
+            ids = np.zeros(len(det), np.int64)
+        elif det is None:
+            det, ids = tracker.predict()
+        else:
+            det, ids = tracker.update(det)
+
+        xyxy = det.xyxy.astype(np.int32)
+        cls = det.cls
+        # Each source may run at its own resolution: calibrated focal lengths
+        # and fitted scales refer to image_size and follow the frame width
+        scale = self._frame_scale(frame_width)
+        intrinsics = self.calibration is not None and self.calibration.camera_matrix is not None
+        focal = self.focal_length * scale if intrinsics else self.focal_length
+        distances = calculate_distances(xyxy, cls, self._width_table, focal)
+        if self._scale_table is not None:
+            # Fitted classes: scale / width_px + offset, only where the fit applies
+            fitted = calculate_distances(xyxy, cls, self._scale_table, scale)
+            use = fitted > 0
+            distances[use] = fitted[use] + self._offset_table[cls[use]]
+        if tracker is not None:
+            distances = tracker.smooth_distances(ids, distances)
+        bands = distance_bands(distances)
+        known = ~np.isnan(distances)
+        is_target = cls == self._target_id
+        bearings = calculate_bearings(xyxy, frame_width, focal)
+        self._update_roi(name, xyxy, is_target)
+        return xyxy, cls, distances, bands, known, is_target, ids, bearings
+
+    def _annotate_rgb(self, name):
+        slot = self._result_slots[name]
+        fps_counter = self._fps[name]
+        channel = self.channels[name]
+
+        while self.running:
+            packet = slot.get(timeout=0.1)
+            if packet is None:
+                continue
+
+            t0 = time.perf_counter()
+            self.stats.record(f"handoff_annotate:{name}", t0 - packet.queued_at)
+            frame = packet.frame
+
+            packet.detections = self._postprocess(name, packet.results, frame.shape[1])
+            self._latest_detections[name] = (packet.seq, time.time(), packet.detections)
+            if self.on_detections is not None:
+                self.on_detections(name, packet)
+            t1 = time.perf_counter()
+            self.stats.record(f"postprocess:{name}", t1 - t0)
+
+            xyxy, cls, distances, bands, known, is_target, ids, _ = packet.detections
+            for (x1, y1, x2, y2), c, distance, band, has_width, target, track_id in zip(
+                    xyxy.tolist(), cls.tolist(), distances.tolist(), bands.tolist(), known.tolist(),
+                    is_target.tolist(), ids.tolist()):
+                label = self.backend.names[c]
+                if track_id:
+                    label = f"{label} #{track_id}"
+                color = BAND_COLORS[band]
+                dist_text = ""
+
+                if has_width:
+                    dist_text = f"{distance:.0f}cm"
+                    if target:
+                        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 0), 3) # Cyan thick box
+
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                full_label = f"{label} {dist_text}"
+                cv2.putText(frame, full_label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
             # FPS Calculation
-            self.frame_count += 1
-            elapsed = time.time() - self.start_time
-            if elapsed > 1:
-                self.fps = self.frame_count / elapsed
-                self.frame_count = 0
-                self.start_time = time.time()
-
-            cv2.putText(frame, f"FPS: {self.fps:.1f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # Convert to PIL
-            img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            img_pil = Image.fromarray(img_rgb)
-            
-            if not self.frame_queue.empty():
-                try: self.frame_queue.get_nowait()
-                except: pass
-            self.frame_queue.put(img_pil)
-
-        self.cap.release()
+            fps = fps_counter.tick()
+            cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+
+            t2 = time.perf_counter()
+            self.stats.record(f"annotate:{name}", t2 - t1)
+
+            # Convert to RGB straight into the channel's buffer pool
+            channel.publish_bgr(frame)
+            self._frame_pool.release(frame)
+            self.stats.record(f"convert:{name}", elapsed_since(t2))
+            # Glass-to-glass: capture timestamp to frame handed to the GUI
+            self.stats.record(f"end_to_end:{name}", elapsed_since(packet.timestamp))
 
     def _process_thermal(self):
-        # Try to open Thermal Camera (Index 1 or 2)
-        self.cap_thermal = cv2.VideoCapture(1, cv2.CAP_DSHOW)
-        if not self.cap_thermal.isOpened():
-            self.cap_thermal = cv2.VideoCapture(2, cv2.CAP_DSHOW)
-        
+        # Try to open Thermal Camera (first index that responds)
+        for index in self.thermal_indexes:
+            if self.thermal_raw:
+                self.cap_thermal = open_source(index, width=None, height=None, fourcc=None, convert_rgb=False)
+            else:
+                self.cap_thermal = open_source(index, width=None, height=None, fourcc=None)
+            if self.cap_thermal.isOpened():
+                break
+        channel = self.channels["thermal"]
+        placeholder_shown = False
+
         while self.running:
             if self.cap_thermal and self.cap_thermal.isOpened():
                 ret, frame = self.cap_thermal.read()
                 if ret:
-                    frame = cv2.resize(frame, (400, 300))
-                    img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    img_pil = Image.fromarray(img_rgb)
-                    
-                    if not self.thermal_queue.empty():
-                        try: self.thermal_queue.get_nowait()
-                        except: pass
-                    self.thermal_queue.put(img_pil)
+                    recorder = self.recorder
+                    if recorder is not None:
+                        recorder.frames("thermal").write(frame)
+                    display, hotspots, _ = self.thermal.process(frame)
+                    self._latest_hotspots = (time.time(), hotspots)
+                    channel.publish_bgr(display)
                 else:
                     time.sleep(0.1)
             else:
-                # Placeholder
-                blank = np.zeros((300, 400, 3), np.uint8)
-                cv2.putText(blank, "NO THERMAL CAM", (80, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                img_pil = Image.fromarray(blank)
-                
-                if not self.thermal_queue.empty():
-                        try: self.thermal_queue.get_nowait()
-                        except: pass
-                self.thermal_queue.put(img_pil)
+                # Placeholder: it never changes, so publish it once
+                if not placeholder_shown:
+                    blank = np.zeros((300, 400, 3), np.uint8)
+                    cv2.putText(blank, "NO THERMAL CAM", (80, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                    channel.publish_bgr(blank)
+                    placeholder_shown = True
                 time.sleep(0.5)
@@ -1,27 +1,42 @@
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
 import numpy as np
-import collections
+import time
+from .utils import RingBuffer
 
 class SensorVisualizer:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, redraw_hz=30.0, blit=True):
         self.parent = parent_frame
-        
+
         # Data storage
         self.max_points = 50
-        self.data_history = collections.deque([0]*self.max_points, maxlen=self.max_points)
-        
+        self.data_history = RingBuffer(self.max_points)
+        self._x = np.arange(self.max_points)
+
+        # Optional modules.fusion.OccupancyGrid the radar is drawn from
+        self.local_map = None
+        # Optional modules.metrics histogram of redraw times (ms)
+        self._draw_ms = None
+
+        # Rendering: samples are stored on every update(), the canvas is
+        # only redrawn at redraw_hz. With blit, only the data artists are
+        # re-rendered over a cached background of axes, grids and labels.
+        self.blit = blit
+        self.set_redraw_rate(redraw_hz)
+        self._last_draw = 0.0
+        self._background = None
+
         # Setup Figure
         self.fig = Figure(figsize=(5, 4), dpi=100, facecolor='#101010')
-        
+
         # 1. Line Graph (Distance over Time)
         self.ax_graph = self.fig.add_subplot(211)
         self.ax_graph.set_facecolor('#1a1a1a')
-        self.line, = self.ax_graph.plot([], [], color='#00e676', linewidth=2)
+        self.line, = self.ax_graph.plot(self._x, self.data_history.view(), color='#00e676', linewidth=2, animated=blit)
         self.ax_graph.set_title("Ultrasonic Distance (cm)", color='white', fontsize=10)
         self.ax_graph.tick_params(axis='x', colors='white')
         self.ax_graph.tick_params(axis='y', colors='white')
+        self.ax_graph.set_xlim(0, self.max_points)
         self.ax_graph.set_ylim(0, 400)
         self.ax_graph.grid(True, color='#333')
 
@@ -35,29 +50,73 @@ class SensorVisualizer:
         self.ax_radar.set_theta_direction(-1)
         self.ax_radar.set_rlim(0, 400)
         self.ax_radar.grid(True, color='#333')
-        
+
         # Radar scatter point
-        self.radar_point, = self.ax_radar.plot([], [], 'ro', markersize=8)
-        
+        self.radar_point, = self.ax_radar.plot([], [], 'ro', markersize=8, animated=blit)
+
         # Canvas
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.parent)
+        # Every full draw (first show, resize) refreshes the cached background
+        self.canvas.mpl_connect('draw_event', self._on_draw)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side='top', fill='both', expand=True)
 
-    def update(self, distance):
+    def register_metrics(self, registry, prefix="gui"):
+        self._draw_ms = registry.histogram(f"{prefix}.draw_ms")
+
+    def set_local_map(self, grid):
+        """Draw the radar from the nearest obstacle per sector of an OccupancyGrid."""
+        self.local_map = grid
+
+    def set_redraw_rate(self, hz):
+        self.redraw_interval = 1.0 / hz if hz > 0 else 0.0
+
+    def add_samples(self, distances):
+        """Store several samples at once without redrawing."""
+        self.data_history.extend(distances)
+
+    def update(self, distance=None):
         # Update Data
-        self.data_history.append(distance)
-        
+        if distance is not None:
+            self.data_history.append(distance)
+
+        now = time.perf_counter()
+        if now - self._last_draw < self.redraw_interval:
+            return
+        self._last_draw = now
+
         # Update Line Graph
-        self.line.set_data(range(len(self.data_history)), self.data_history)
-        self.ax_graph.set_xlim(0, len(self.data_history))
-        
+        self.line.set_ydata(self.data_history.view())
+
         # Update Radar
-        # Simulating a scan: We only have one sensor, so we just show a point at 0 degrees (Front)
-        # To make it look like a "scan", we could fade old points, but for now, let's just show the current reading.
-        if distance > 0:
-            self.radar_point.set_data([0], [distance])
+        if self.local_map is not None:
+            # Nearest occupied cell per sector of the fused local map
+            nearest = self.local_map.nearest_per_sector()
+            seen = np.isfinite(nearest)
+            self.radar_point.set_data(self.local_map.sector_angles[seen], nearest[seen])
         else:
-            self.radar_point.set_data([], [])
+            # Without a map only the front ultrasonic reading is shown, at 0 degrees
+            latest = self.data_history.last()
+            if latest > 0:
+                self.radar_point.set_data([0], [latest])
+            else:
+                self.radar_point.set_data([], [])
 
-        self.canvas.draw()
+        if self.blit and self._background is not None:
+            self.canvas.restore_region(self._background)
+            self._draw_artists()
+            self.canvas.blit(self.fig.bbox)
+        else:
+            self.canvas.draw_idle()
+        if self._draw_ms is not None:
+            self._draw_ms.record((time.perf_counter() - now) * 1000.0)
+
+    def _draw_artists(self):
+        self.ax_graph.draw_artist(self.line)
+        self.ax_radar.draw_artist(self.radar_point)
+
+    def _on_draw(self, event):
+        if not self.blit:
+            return
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
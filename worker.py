@@ -0,0 +1,463 @@
+import multiprocessing
+import queue
+import threading
+import time
+import weakref
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .utils import get_logger
+from .vision import DETECTION_FIELDS, FOCUS_MODES, MAX_DETECTIONS, pack_detections
+
+log = get_logger(__name__)
+
+# --- VISION WORKER PROCESS ---
+# VisionProcess runs VisionSystem in a child process so inference and
+# post-processing do not compete with the Tk mainloop, the plots and the
+# serial reader for the GIL. Annotated frames and detections come back
+# through shared-memory rings; only settings and a once-a-second status
+# message travel through multiprocessing queues.
+
+DEFAULT_MAX_FRAME_SHAPE = (720, 1280, 3)
+HEARTBEAT_INTERVAL = 1.0
+
+class SharedRing:
+    """
+    Ring of arrays in one shared memory block, written by a single producer
+    and read from any process. Every slot holds an array of up to max_shape
+    plus its sequence number, timestamp and actual shape; a reader re-checks
+    the slot sequence after copying, so a slot overwritten mid-copy is
+    detected and read again.
+    """
+    def __init__(self, max_shape, dtype=np.uint8, slots=4, name=None):
+        self.max_shape = tuple(max_shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        header_dtype = np.dtype([("seq", "<i8"), ("latest", "<i8")])
+        slot_dtype = np.dtype([("seq", "<i8"), ("time", "<f8"), ("shape", "<i8", (len(self.max_shape),))])
+        self._slot_size = int(np.prod(self.max_shape))
+        meta_offset = 64
+        data_offset = meta_offset + -(-slots * slot_dtype.itemsize // 64) * 64
+        size = data_offset + slots * self._slot_size * self.dtype.itemsize
+
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self._header = np.ndarray((), header_dtype, buffer=self.shm.buf)
+        self._meta = np.ndarray((slots,), slot_dtype, buffer=self.shm.buf, offset=meta_offset)
+        self._data = np.ndarray((slots, self._slot_size), self.dtype, buffer=self.shm.buf, offset=data_offset)
+        if self.owner:
+            self._header["seq"] = 0
+            self._header["latest"] = -1
+            self._meta["seq"] = -1
+
+    def spec(self):
+        """Picklable description used by attach() in another process."""
+        return {"name": self.shm.name, "max_shape": self.max_shape, "dtype": self.dtype.str, "slots": self.slots}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec["max_shape"], spec["dtype"], spec["slots"], name=spec["name"])
+
+    @property
+    def seq(self):
+        return int(self._header["seq"])
+
+    def _begin(self, shape):
+        """Claim the slot after the latest one and return (index, writable view), or None if shape does not fit."""
+        if len(shape) != len(self.max_shape) or any(s > m for s, m in zip(shape, self.max_shape)):
+            return None
+        i = (int(self._header["latest"]) + 1) % self.slots
+        self._meta["seq"][i] = -1
+        return i, self._data[i, :int(np.prod(shape))].reshape(shape)
+
+    def _commit(self, i, shape, t):
+        seq = self.seq + 1
+        self._meta["time"][i] = time.time() if t is None else t
+        self._meta["shape"][i] = shape
+        self._meta["seq"][i] = seq
+        self._header["latest"] = i
+        self._header["seq"] = seq
+
+    def write(self, array, t=None):
+        got = self._begin(array.shape)
+        if got is None:
+            return False
+        i, view = got
+        np.copyto(view, array)
+        self._commit(i, array.shape, t)
+        return True
+
+    def has_new(self, last_seq):
+        """True if something newer than last_seq is published (same rule as FrameChannel)."""
+        return int(self._header["latest"]) >= 0 and self.seq != last_seq
+
+    def read(self, last_seq=0, out=None):
+        """Copy the latest array if it is newer than last_seq; returns (seq, time, array) or None."""
+        for _ in range(3):
+            i = int(self._header["latest"])
+            if i < 0:
+                return None
+            seq = int(self._meta["seq"][i])
+            if seq < 0:
+                continue  # being rewritten
+            if seq == last_seq:
+                return None
+            shape = tuple(int(n) for n in self._meta["shape"][i])
+            t = float(self._meta["time"][i])
+            if out is None or out.shape != shape:
+                out = np.empty(shape, self.dtype)
+            np.copyto(out, self._data[i, :int(np.prod(shape))].reshape(shape))
+            if int(self._meta["seq"][i]) == seq:
+                return seq, t, out
+        return None
+
+    def clear(self):
+        self._header["latest"] = -1
+        self._header["seq"] = self.seq + 1
+
+    def close(self):
+        self._header = self._meta = self._data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class SharedFrameChannel(SharedRing):
+    """
+    FrameChannel interface over a SharedRing: the worker publishes into
+    shared memory, the GUI process acquires copies into local buffers.
+    ChannelQueue and FrameView work on it unchanged.
+    """
+    def __init__(self, max_shape=DEFAULT_MAX_FRAME_SHAPE, dtype=np.uint8, slots=4, name=None):
+        super().__init__(max_shape, dtype, slots, name)
+        self._free = []
+        self._lock = threading.Lock()
+        self._oversize_logged = False
+
+    def _claim(self, shape):
+        got = self._begin(shape)
+        if got is None and not self._oversize_logged:
+            log.warning("frame %s exceeds shared buffer %s, not published", shape, self.max_shape)
+            self._oversize_logged = True
+        return got
+
+    def publish_bgr(self, frame):
+        got = self._claim(frame.shape)
+        if got is None:
+            return False
+        i, view = got
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=view)
+        self._commit(i, frame.shape, None)
+        return True
+
+    def publish_rgb(self, frame):
+        got = self._claim(frame.shape)
+        if got is None:
+            return False
+        i, view = got
+        np.copyto(view, frame)
+        self._commit(i, frame.shape, None)
+        return True
+
+    def acquire(self, last_seq=0):
+        with self._lock:
+            buf = self._free.pop() if self._free else None
+        got = self.read(last_seq, buf)
+        if got is None:
+            if buf is not None:
+                self.release(buf)
+            return None
+        seq, _, buf = got
+        return seq, buf
+
+    def release(self, buf):
+        with self._lock:
+            self._free.append(buf)
+
+def _run_worker(vision_kwargs, frame_specs, detection_specs, settings, control, status, stop):
+    """Child process entry point: a VisionSystem publishing into the shared rings."""
+    from .vision import VisionSystem
+
+    status.cancel_join_thread()
+    channels = {name: SharedFrameChannel.attach(spec) for name, spec in frame_specs.items()}
+    rings = {name: SharedRing.attach(spec) for name, spec in detection_specs.items()}
+    packed = np.empty((MAX_DETECTIONS, len(DETECTION_FIELDS)), np.float64)
+
+    def publish_detections(name, packet):
+        rings[name].write(pack_detections(packet.detections, packed))
+
+    def apply(method, args):
+        # A failing setting is reported to the parent (which forgets it) instead of killing the worker
+        try:
+            getattr(vision, method)(*args)
+        except Exception as e:
+            log.exception("vision worker: %s%r failed", method, args)
+            status.put(("error", method, args, f"{type(e).__name__}: {e}"))
+
+    vision = VisionSystem(**vision_kwargs)
+    vision.channels.update(channels)
+    vision.on_detections = publish_detections
+    for method, args in settings.items():
+        apply(method, args)
+    vision.warm_up()
+    vision.start()
+
+    try:
+        next_beat = 0.0
+        parent = multiprocessing.parent_process()
+        while not stop.is_set() and (parent is None or parent.is_alive()):
+            try:
+                method, args = control.get(timeout=0.2)
+                apply(method, args)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_beat:
+                next_beat = time.monotonic() + HEARTBEAT_INTERVAL
+                fps = {name: counter.fps for name, counter in vision._fps.items()}
+                # Published frame numbers: lets the parent tell a stalled pipeline from an idle control loop
+                progress = tuple(channels[name].seq for name in vision.rgb_sources)
+                status.put((fps, vision.get_stage_latency(), vision.backend.names, progress))
+    finally:
+        vision.stop()
+        vision.join()
+        for ring in list(channels.values()) + list(rings.values()):
+            ring.close()
+
+def _close_rings(rings):
+    for ring in rings:
+        ring.close()
+
+class VisionProcess:
+    """
+    Drop-in replacement for VisionSystem that runs the pipeline in a
+    worker process. frame_channel / thermal_channel / frame_queue /
+    thermal_queue behave as before; get_detections() returns the latest
+    DETECTION_FIELDS rows of a source. Settings are replayed when the
+    worker is restarted, which happens automatically (with backoff) if it
+    crashes, does not report in within startup_timeout, stops sending
+    heartbeats, or stops publishing frames. rgb_sources must be picklable
+    (camera indexes, or sources that can be rebuilt in the child).
+    """
+    def __init__(self, max_frame_shape=DEFAULT_MAX_FRAME_SHAPE, heartbeat_timeout=10.0, restart_delay=1.0,
+                 startup_timeout=120.0, **vision_kwargs):
+        from .vision import DEFAULT_RGB_SOURCES
+        from .transport import ChannelQueue
+
+        self.vision_kwargs = vision_kwargs
+        self.rgb_sources = dict(vision_kwargs.get("rgb_sources") or DEFAULT_RGB_SOURCES)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout  # model load + camera open
+        self.restart_delay = restart_delay
+        self.running = False
+        self.restarts = 0
+
+        self.channels = {name: SharedFrameChannel(max_frame_shape) for name in self.rgb_sources}
+        self.channels["thermal"] = SharedFrameChannel(max_frame_shape)
+        self.queues = {name: ChannelQueue(channel) for name, channel in self.channels.items()}
+        self._detections = {name: SharedRing((MAX_DETECTIONS, len(DETECTION_FIELDS)), np.float64)
+                            for name in self.rgb_sources}
+        self._finalizer = weakref.finalize(
+            self, _close_rings, list(self.channels.values()) + list(self._detections.values()))
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._settings = {}
+        self._process = None
+        self._control = None
+        self._status = None
+        self._stop = None
+        self._monitor_thread = None
+        self._halt = threading.Event()
+        self._last_status = ({}, {}, {}, ())
+        self._last_beat = None
+        self._spawned_at = None
+        self._last_advance = None  # when published frame numbers last moved
+        self._failures = 0
+        self.last_error = None  # (method, message) of the last setting the worker rejected
+
+    # The first RGB source and the thermal stream keep their historical names
+    @property
+    def frame_channel(self):
+        return self.channels[next(iter(self.rgb_sources))]
+
+    @property
+    def thermal_channel(self):
+        return self.channels["thermal"]
+
+    @property
+    def frame_queue(self):
+        return self.queues[next(iter(self.rgb_sources))]
+
+    @property
+    def thermal_queue(self):
+        return self.queues["thermal"]
+
+    @property
+    def fps(self):
+        return self._last_status[0].get(next(iter(self.rgb_sources)), 0)
+
+    def get_channel(self, source):
+        return self.channels[source]
+
+    def get_queue(self, source):
+        return self.queues[source]
+
+    @property
+    def names(self):
+        """Model class names, known once the worker has reported in."""
+        return self._last_status[2]
+
+    def get_stage_latency(self):
+        """Stage summary from the worker's last heartbeat."""
+        return self._last_status[1]
+
+    def get_detections(self, source, last_seq=0):
+        """(seq, time.time(), rows) for detections newer than last_seq, else None."""
+        return self._detections[source].read(last_seq)
+
+    def register_metrics(self, registry, prefix="vision"):
+        """Same metrics as VisionSystem.register_metrics, taken from the worker's heartbeats."""
+        def stage(key):
+            return lambda: {k: v for k, v in self.get_stage_latency().get(key, {}).items()
+                            if k in ("p50_ms", "p95_ms", "max_ms")}
+
+        def dropped(name):
+            return lambda: sum(self.get_stage_latency().get("dropped", {}).get(name, {}).values())
+
+        registry.gauge(f"{prefix}.inference_ms", stage("inference"))
+        registry.counter(f"{prefix}.worker_restarts", lambda: self.restarts)
+        for name in self.rgb_sources:
+            registry.gauge(f"{prefix}.{name}.fps", lambda n=name: self._last_status[0].get(n, 0))
+            registry.gauge(f"{prefix}.{name}.end_to_end_ms", stage(f"end_to_end:{name}"))
+            registry.counter(f"{prefix}.{name}.published", lambda n=name: self.channels[n].seq)
+            registry.counter(f"{prefix}.{name}.dropped", dropped(name))
+
+    # --- SETTINGS (forwarded to the worker, replayed on restart) ---
+    def _send(self, method, *args):
+        # Arguments are validated before they get here: a stored setting is replayed on every restart
+        self._settings[method] = args
+        if self._control is not None and self._process is not None and self._process.is_alive():
+            self._control.put((method, args))
+
+    def set_focal_length(self, fl):
+        self._send("set_focal_length", float(fl))
+
+    def set_target_class(self, target):
+        self._send("set_target_class", str(target))
+
+    def load_calibration(self, calibration):
+        from .calibration import load_profile
+
+        load_profile(calibration)  # raises here for a missing or corrupt profile
+        self._send("load_calibration", calibration)
+
+    def set_focus(self, focus, roi=None):
+        if focus not in FOCUS_MODES:
+            raise ValueError(f"unknown focus {focus!r}, expected one of {FOCUS_MODES}")
+        self._send("set_focus", focus, None if roi is None else bool(roi))
+
+    # --- LIFECYCLE ---
+    def _spawn(self):
+        self._control = self._ctx.Queue()
+        self._status = self._ctx.Queue()
+        self._stop = self._ctx.Event()
+        frame_specs = {name: channel.spec() for name, channel in self.channels.items()}
+        detection_specs = {name: ring.spec() for name, ring in self._detections.items()}
+        self._process = self._ctx.Process(
+            target=_run_worker, name="vision-worker", daemon=True,
+            args=(self.vision_kwargs, frame_specs, detection_specs, dict(self._settings),
+                  self._control, self._status, self._stop))
+        self._last_beat = None
+        self._last_advance = None
+        self._spawned_at = time.monotonic()
+        self._process.start()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._halt.clear()
+        self._failures = 0
+        self._spawn()
+        self._monitor_thread = threading.Thread(target=self._monitor, daemon=True)
+        self._monitor_thread.start()
+
+    def _shutdown_worker(self, timeout=5.0):
+        proc = self._process
+        if proc is None:
+            return
+        self._stop.set()
+        proc.join(timeout)
+        if proc.is_alive():
+            proc.terminate()
+            proc.join(1.0)
+        self._process = None
+
+    def stop(self):
+        self.running = False
+        self._halt.set()
+        if self._monitor_thread is not None:
+            self._monitor_thread.join()
+            self._monitor_thread = None
+        self._shutdown_worker()
+
+    def join(self, timeout=1.0):
+        pass  # stop() already waits for the worker
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def close(self):
+        """Stop the worker and free the shared memory."""
+        self.stop()
+        self._finalizer()
+
+    def _drain_status(self):
+        try:
+            while True:
+                message = self._status.get_nowait()
+                if message[0] == "error":
+                    _, method, args, error = message
+                    log.warning("vision worker rejected %s%r: %s", method, args, error)
+                    if self._settings.get(method) == args:
+                        del self._settings[method]
+                    self.last_error = (method, error)
+                    continue
+                now = time.monotonic()
+                if message[3] != self._last_status[3] and any(message[3]):
+                    self._last_advance = now
+                    self._failures = 0
+                self._last_status = message
+                self._last_beat = now
+        except (queue.Empty, OSError, EOFError):
+            pass
+
+    def _monitor(self):
+        while not self._halt.wait(0.2):
+            self._drain_status()
+            proc = self._process
+            now = time.monotonic()
+            if proc.is_alive():
+                if self._last_beat is None:
+                    if now - self._spawned_at < self.startup_timeout:
+                        continue
+                    log.warning("vision worker did not report in within %.0f s, restarting", self.startup_timeout)
+                elif now - self._last_beat >= self.heartbeat_timeout:
+                    log.warning("vision worker unresponsive for %.0f s, restarting", self.heartbeat_timeout)
+                elif self._last_advance is not None and now - self._last_advance >= self.heartbeat_timeout:
+                    # Only once frames have flowed: a source that never opens is not a hang
+                    log.warning("vision pipeline published nothing for %.0f s, restarting", self.heartbeat_timeout)
+                else:
+                    continue
+            else:
+                log.warning("vision worker exited with code %s, restarting", proc.exitcode)
+            self._shutdown_worker(timeout=1.0)
+
+            # Back off while the worker keeps failing before it reports in
+            self._failures += 1
+            self.restarts += 1
+            if self._halt.wait(min(30.0, self.restart_delay * 2 ** (self._failures - 1))):
+                break
+            self._spawn()